@@ -0,0 +1,321 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from dataclasses import dataclass, asdict
+from multiprocessing.connection import Connection
+from typing import List, Dict, Any, Optional
+
+from PIL import Image, ImageDraw
+
+from fxwebgen.context import Context
+from fxwebgen.generator import Generator
+from fxwebgen.postprocessor import PostProcessor
+from fxwebgen.templater import create_templater
+
+SCENARIO_COLD = 'cold'
+SCENARIO_NOOP = 'noop'
+SCENARIO_TOUCH_PAGE = 'touch_page'
+SCENARIO_TOUCH_TEMPLATE = 'touch_template'
+SCENARIOS: List[str] = [SCENARIO_COLD, SCENARIO_NOOP, SCENARIO_TOUCH_PAGE, SCENARIO_TOUCH_TEMPLATE]
+DEFAULT_TOLERANCE = 0.25
+# Short scenarios, e.g. a no-op build, are dominated by noise, so a regression must also exceed an absolute margin.
+MIN_MARGIN = 0.1
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et '
+         'dolore magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip').split()
+GLOBAL_VARS = {
+    'project': {'name': 'Benchmark', 'version': '1.0', 'url': 'https://example.org'},
+    'interlinks': {'docs': 'https://example.org/docs/'},
+}
+TEMPLATES = {
+    'page.html': '<!DOCTYPE html>\n<html><head><title>{{ title }} | {{ project.name }}</title></head>\n<body>\n'
+                 '{% include "nav.html" %}\n'
+                 '{% if toc %}<aside>{{ toc|safe }}</aside>{% endif %}\n'
+                 '<main>{{ body|safe }}</main>\n'
+                 '<ul>{% for release in datasets.releases %}{% if loop.index <= 5 %}'
+                 '<li>{{ release.version }}: {{ release.notes }}</li>{% endif %}{% endfor %}</ul>\n'
+                 '</body></html>\n',
+    'nav.html': '<nav><a href="{{ webroot }}/index.html">{{ project.name }}</a>'
+                '{% for item in data.links %} <a href="{{ webroot }}/{{ item.path }}">{{ item.title }}</a>'
+                '{% endfor %}</nav>\n',
+    # The data of the page template are available to the included templates as well.
+    'page.json': json.dumps({'links': [{'title': f'Section {i}', 'path': f'section-{i}/'} for i in range(10)]}),
+    # The download snippet uses only global variables, the notice snippet depends on the page.
+    'snippets/download.html': '<a class="btn btn-primary" href="{{ project.url }}">'
+                              'Download {{ project.name }} {{ project.version }}</a>',
+    'snippets/notice.html': '<span class="notice">You are reading "{{ title }}".</span>',
+}
+
+
+@dataclass
+class SiteSpec:  # pylint: disable=too-many-instance-attributes
+    pages: int = 200
+    images: int = 20
+    dataset_items: int = 2000
+    static_depth: int = 4
+    static_width: int = 3
+    static_files: int = 5
+    image_size: int = 1200
+    seed: int = 1
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+def generate_site(root: str, spec: SiteSpec) -> None:
+    rnd = random.Random(spec.seed)
+    for name, content in TEMPLATES.items():
+        _write(os.path.join(root, 'templates', name), content)
+    _write(os.path.join(root, 'snippets', 'intro.md'),
+           'This page is a part of the *${project.name}* benchmark.\n\n{$ links.md $}\n')
+    _write(os.path.join(root, 'snippets', 'links.md'), '- [Project](${project.url})\n- [Docs](docs>index.html)\n')
+    _write(os.path.join(root, 'datasets', 'releases.json'), json.dumps([
+        {'version': f'{i // 100}.{i % 100}', 'notes': _words(rnd, 12), 'tags': _words(rnd, 3).split()}
+        for i in range(spec.dataset_items)]))
+    images = [f'image-{i:03}.jpg' for i in range(spec.images)]
+    for index, name in enumerate(images):
+        _create_image(os.path.join(root, 'static', 'images', name), spec.image_size, index)
+    _create_static_tree(os.path.join(root, 'static', 'assets'), spec.static_depth, spec)
+    for index in range(spec.pages):
+        _write(_page_path(root, index), _create_page(rnd, index, spec.pages, images))
+
+
+def _create_page(rnd: random.Random, index: int, n_pages: int, images: List[str]) -> str:
+    other = (index + 1) % n_pages
+    lines = [
+        f'Title: Page {index}',
+        'Datasets: releases',
+        'Snippets: Download, Notice',
+        '',
+        '[TOC]',
+        '',
+        f'# Page {index}',
+        '',
+        f'{_words(rnd, 30)} ${{project.name}} ${{project.version}} [next](:page-{other}.html), '
+        f'[docs](docs>page-{other}.html) and {{. badge}} [Snippet: Download]',
+        '',
+        '{$ intro.md $}',
+        '',
+    ]
+    for section in range(4):
+        lines += [
+            f'## Section {section}',
+            '',
+            _words(rnd, 60),
+            '',
+            f'!!! note "Note {section}"',
+            f'    {_words(rnd, 20)}',
+            '',
+            f'{{row: #row-{section}}}',
+            '{col-md-6:}',
+            _words(rnd, 25),
+            '{:col-md-6}',
+            '{col-md-6:}',
+            f'[Snippet: Notice] {_words(rnd, 25)}',
+            '{:col-md-6}',
+            '{:row}',
+            '',
+        ]
+    lines += [
+        '<bootstrap>',
+        f'<accordion id="faq-{index}">',
+    ]
+    for entry in range(3):
+        lines += ['<entry>', f'<header>Question {entry}</header>', f'<body>{_words(rnd, 20)}</body>', '</entry>']
+    lines += ['</accordion>', '</bootstrap>', '']
+    if images:
+        lines.append('+Gallery 3cols')
+        for i in range(3):
+            image = images[(index * 3 + i) % len(images)]
+            lines.append(f'+[Image {i}](:static/images/{image}|{160 * (i + 1)}x{120 * (i + 1)})')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def _create_image(path: str, size: int, index: int) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image = Image.new('RGB', (size, size * 3 // 4), (index * 37 % 256, index * 67 % 256, index * 97 % 256))
+    draw = ImageDraw.Draw(image)
+    for i in range(0, size, 40):
+        draw.line((0, i, size, size - i), fill=(255 - i % 256, i % 256, 128), width=5)
+    image.save(path, quality=90)
+
+
+def _create_static_tree(path: str, depth: int, spec: SiteSpec) -> None:
+    for index in range(spec.static_files):
+        _write(os.path.join(path, f'file-{index}.css'), f'.rule-{index} {{ color: #{index:06x}; }}\n' * 50)
+    if depth > 0:
+        for index in range(spec.static_width):
+            _create_static_tree(os.path.join(path, f'dir-{index}'), depth - 1, spec)
+
+
+def _page_path(root: str, index: int) -> str:
+    return os.path.join(root, 'pages', f'page-{index}.md')
+
+
+def _words(rnd: random.Random, count: int) -> str:
+    return ' '.join(rnd.choice(WORDS) for _i in range(count))
+
+
+def _write(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wt', encoding='utf-8') as fh:
+        fh.write(content)
+
+
+def _touch(path: str) -> None:
+    # The mtime must change even if the previous build finished within the timestamp resolution.
+    mtime = max(time.time(), os.path.getmtime(path) + 1)
+    os.utime(path, (mtime, mtime))
+
+
+def create_context(root: str, jobs: int = 1) -> Context:
+    cache_dir = os.path.join(root, 'cache')
+    templater = create_templater(os.path.join(root, 'templates'), GLOBAL_VARS, os.path.join(cache_dir, 'jinja2'))
+    return Context(templater, os.path.join(root, 'output'),
+                   pages_dir=os.path.join(root, 'pages'),
+                   static_dirs=[os.path.join(root, 'static')],
+                   datasets_dir=os.path.join(root, 'datasets'),
+                   snippets_dir=os.path.join(root, 'snippets'),
+                   interlinks=dict(GLOBAL_VARS['interlinks']),
+                   global_vars=GLOBAL_VARS,
+                   jobs=jobs,
+                   cache_dir=cache_dir)
+
+
+def build(root: str, jobs: int = 1, verbose: bool = False) -> float:
+    # Each build runs in a new process like the fxwebgen command, so that no process-wide cache stays warm.
+    receiver, sender = multiprocessing.Pipe(False)
+    process = multiprocessing.Process(target=_build, args=(sender, root, jobs, verbose))
+    process.start()
+    sender.close()
+    try:
+        seconds: float = receiver.recv()
+    except EOFError:
+        seconds = -1
+    process.join()
+    if seconds < 0:
+        raise RuntimeError(f'Build of "{root}" failed with exit code {process.exitcode}.')
+    return seconds
+
+
+def _build(sender: Connection, root: str, jobs: int, verbose: bool) -> None:
+    try:
+        start = time.perf_counter()
+        with open(os.devnull, 'wt', encoding='utf-8') as devnull, redirect_stdout(sys.stdout if verbose else devnull):
+            Generator(create_context(root, jobs), post_processor=PostProcessor()).build()
+        sender.send(time.perf_counter() - start)
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+    finally:
+        sender.close()
+
+
+def run(root: str, spec: SiteSpec, *, repeat: int = 3, jobs: int = 1, verbose: bool = False) -> Dict[str, float]:
+    # The best time of each scenario is reported, as it is the least affected by other load of the machine.
+    times: Dict[str, List[float]] = {scenario: [] for scenario in SCENARIOS}
+    generate_site(root, spec)
+    for _i in range(repeat):
+        for path in 'output', 'cache':
+            shutil.rmtree(os.path.join(root, path), ignore_errors=True)
+        times[SCENARIO_COLD].append(build(root, jobs, verbose))
+        times[SCENARIO_NOOP].append(build(root, jobs, verbose))
+        page = _page_path(root, 0)
+        with open(page, 'at', encoding='utf-8') as fh:
+            fh.write('\nTouched.\n')
+        _touch(page)
+        times[SCENARIO_TOUCH_PAGE].append(build(root, jobs, verbose))
+        _touch(os.path.join(root, 'templates', 'page.html'))
+        times[SCENARIO_TOUCH_TEMPLATE].append(build(root, jobs, verbose))
+    return {scenario: min(values) for scenario, values in times.items()}
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    for scenario, seconds in results.items():
+        expected = baseline.get(scenario)
+        if expected is not None and seconds > max(expected * (1 + tolerance), expected + MIN_MARGIN):
+            regressions.append(f'{scenario}: {seconds:.3f} s > {expected:.3f} s + {tolerance:.0%}')
+    return regressions
+
+
+def main(argv: List[str]) -> int:
+    defaults = SiteSpec()
+    parser = ArgumentParser(prog=argv[0], description='Measure fxwebgen builds of a synthetic website.')
+    parser.add_argument('--pages', type=int, default=defaults.pages, help='The number of Markdown pages.')
+    parser.add_argument('--images', type=int, default=defaults.images, help='The number of gallery images.')
+    parser.add_argument('--dataset-items', type=int, default=defaults.dataset_items,
+                        help='The number of items of the dataset used by each page.')
+    parser.add_argument('--static-depth', type=int, default=defaults.static_depth,
+                        help='The depth of the tree of static files.')
+    parser.add_argument('--static-width', type=int, default=defaults.static_width,
+                        help='The number of subdirectories of each directory of static files.')
+    parser.add_argument('--static-files', type=int, default=defaults.static_files,
+                        help='The number of files in each directory of static files.')
+    parser.add_argument('--image-size', type=int, default=defaults.image_size, help='The width of the images.')
+    parser.add_argument('--seed', type=int, default=defaults.seed, help='The seed of the generated text.')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='The number of runs of each scenario.')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='The number of worker processes.')
+    parser.add_argument('-d', '--dir', help='The directory of the synthetic website. It is kept after the benchmark. '
+                                            'A temporary directory is used by default.')
+    parser.add_argument('-b', '--baseline', default=DEFAULT_BASELINE,
+                        help='Compare the results with a baseline file and fail on regressions (default: the baseline '
+                             'of the default parameters next to this script). An empty value disables the comparison.')
+    parser.add_argument('-s', '--save-baseline', help='Save the results as a baseline file.')
+    parser.add_argument('-t', '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'The allowed slowdown against the baseline (default: {DEFAULT_TOLERANCE}).')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Show the output of the builds.')
+    args = parser.parse_args(argv[1:])
+    spec = SiteSpec(pages=args.pages, images=args.images, dataset_items=args.dataset_items,
+                    static_depth=args.static_depth, static_width=args.static_width, static_files=args.static_files,
+                    image_size=args.image_size, seed=args.seed)
+
+    baseline: Optional[Dict[str, Any]] = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        assert baseline
+        if baseline['site'] != spec.to_dict() or baseline['jobs'] != args.jobs:
+            print(f'The baseline "{args.baseline}" was measured with different parameters: '
+                  f'{baseline["site"]}, jobs: {baseline["jobs"]}.', file=sys.stderr)
+            if args.baseline != DEFAULT_BASELINE:
+                return 2
+            # The default baseline only applies to the default parameters.
+            print('The results are not compared with the baseline.', file=sys.stderr)
+            baseline = None
+
+    if args.dir:
+        root = os.path.abspath(args.dir)
+        results = run(root, spec, repeat=args.repeat, jobs=args.jobs, verbose=args.verbose)
+    else:
+        with tempfile.TemporaryDirectory(prefix='fxwebgen-benchmark-') as root:
+            results = run(root, spec, repeat=args.repeat, jobs=args.jobs, verbose=args.verbose)
+
+    for scenario, seconds in results.items():
+        expected = baseline['results'].get(scenario) if baseline else None
+        print(f'{scenario}: {seconds:.3f} s' + (f' (baseline: {expected:.3f} s)' if expected is not None else ''))
+    if args.save_baseline:
+        with open(args.save_baseline, 'wt', encoding='utf-8') as fh:
+            json.dump({'site': spec.to_dict(), 'jobs': args.jobs, 'results': results}, fh, indent=2)
+            fh.write('\n')
+    if baseline:
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            print('Regressions:\n' + '\n'.join(regressions), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
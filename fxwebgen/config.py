@@ -9,14 +9,21 @@ from typing import Any, Optional, List
 
 from fxwebgen import yaml
 from fxwebgen.context import Context
+from fxwebgen.parsers import HTML_PARSER_CHOICES, HTML_PARSER_PYTHON
+from fxwebgen.publish import PUBLISH_CHOICES, PUBLISH_AUTO
+from fxwebgen.resources import FRESHNESS_CHOICES, FRESHNESS_MTIME
 from fxwebgen.templater import create_templater
 from fxwebgen.utils import abspath
 
 
+# pylint: disable=too-many-instance-attributes
 class Option:
     def __init__(self, name: str, shortcut: Optional[str], default: Any, description: str,
-                 *, required: bool = True, many: bool = False, is_bool: bool = False) -> None:
+                 *, required: bool = True, many: bool = False, is_bool: bool = False, is_int: bool = False,
+                 choices: Optional[List[str]] = None) -> None:
         self.is_bool = is_bool
+        self.is_int = is_int
+        self.choices = choices
         self.required = required
         self.many = many
         self.shortcut = shortcut
@@ -38,6 +45,12 @@ OPT_PATH_PREFIX = 'path_prefix'
 OPT_ENABLE_SNIPPETS = 'enable_snippets'
 OPT_DOWNGRADE_HEADINGS = 'downgrade_headings'
 OPT_TITLE_AS_HEADING = 'title_as_heading'
+OPT_JOBS = 'jobs'
+OPT_IO_JOBS = 'io_jobs'
+OPT_CACHE_DIR = 'cache_dir'
+OPT_FRESHNESS = 'freshness'
+OPT_PUBLISH = 'publish'
+OPT_HTML_PARSER = 'html_parser'
 
 OPTIONS = {opt.name: opt for opt in (
     Option(OPT_CONFIG, 'c', 'config.yaml',
@@ -78,6 +91,35 @@ OPTIONS = {opt.name: opt for opt in (
     Option(OPT_TITLE_AS_HEADING, None, False,
            'When no H1 heading is found, add H1 heading containing the page title as a fallback {default}.',
            required=False, is_bool=True),
+    Option(OPT_JOBS, 'j', 1,
+           'The number of worker processes to build pages and thumbnails with {default}. Use 0 for the number of '
+           'CPUs.',
+           required=False, is_int=True),
+    Option(OPT_IO_JOBS, None, 8,
+           'The number of threads to publish static files with {default}.',
+           required=False, is_int=True),
+    Option(OPT_CACHE_DIR, None, '.fxwebgen-cache',
+           'A directory to keep the build state and other caches in between builds {default}. An empty value, '
+           'e.g. "--cache-dir \'\'" or "cache_dir:" in the configuration file, disables the caches.',
+           required=False),
+    Option(OPT_FRESHNESS, None, FRESHNESS_MTIME,
+           'How to find out whether a generated file is up to date {default}: "mtime" compares modification '
+           'times, "content" compares digests of the file contents recorded in the build state, so it is not '
+           'fooled by modification times changed by git, rsync or restored caches.',
+           required=False, choices=FRESHNESS_CHOICES),
+    Option(OPT_PUBLISH, None, PUBLISH_AUTO,
+           'How to publish static files to the output directory {default}: "copy" copies the data, "hardlink" '
+           'links the source files, "reflink" clones them on file systems with copy-on-write support (btrfs, '
+           'xfs), "copy_file_range" lets the kernel copy the data. Unsupported methods fall back to a copy and '
+           '"auto" tries "reflink" and "copy_file_range" first. With "hardlink", identical files are also linked '
+           'together.',
+           required=False, choices=PUBLISH_CHOICES),
+    Option(OPT_HTML_PARSER, None, HTML_PARSER_PYTHON,
+           'A parser to post-process the HTML of pages with {default}: "html.parser" is always available but slow, '
+           '"lxml" must be installed separately and "auto" uses "lxml" if it is installed. Both produce the same '
+           'output for valid HTML, but "lxml" repairs invalid HTML as web browsers do, e.g. a div element inside '
+           'a paragraph closes the paragraph. "html5lib" is not supported, because its output differs.',
+           required=False, choices=HTML_PARSER_CHOICES),
 )}
 
 
@@ -92,10 +134,14 @@ def add_arguments(parser: ArgumentParser) -> None:
         kwargs: dict = {'dest': option.name}
         if option.many:
             kwargs['nargs'] = '*'
+        if option.choices:
+            kwargs['choices'] = option.choices
         if option.is_bool:
             kwargs['type'] = _parse_bool
             default = 'yes' if option.default else 'no'
         else:
+            if option.is_int:
+                kwargs['type'] = int
             default = repr(option.default)
         kwargs['help'] = option.description.format(default=f'(default: {default})')
         parser.add_argument(*args, **kwargs)
@@ -138,6 +184,12 @@ def parse(args: Namespace) -> Context:
     title_as_heading = _get_bool(args, config, OPT_TITLE_AS_HEADING)
     template = _get_string(args, config, OPT_TEMPLATE)
     path_prefix = _get_string(args, config, OPT_PATH_PREFIX)
+    jobs = _get_int(args, config, OPT_JOBS)
+    io_jobs = _get_int(args, config, OPT_IO_JOBS)
+    cache_dir = _get_path(input_dir, args, config, OPT_CACHE_DIR, allow_empty=True)
+    freshness = _get_string(args, config, OPT_FRESHNESS)
+    publish = _get_string(args, config, OPT_PUBLISH)
+    html_parser = _get_string(args, config, OPT_HTML_PARSER)
 
     assert templates_dir and pages_dir and output_dir
     if global_vars_file:
@@ -153,7 +205,7 @@ def parse(args: Namespace) -> Context:
     interlinks = global_vars.get('interlinks', {})
     interlinks.update(config.get('interlinks', {}))
 
-    templater = create_templater(templates_dir, global_vars)
+    templater = create_templater(templates_dir, global_vars, os.path.join(cache_dir, 'jinja2') if cache_dir else None)
     return Context(templater, output_dir,
                    pages_dir=pages_dir,
                    static_dirs=static_dirs,
@@ -164,14 +216,25 @@ def parse(args: Namespace) -> Context:
                    title_as_heading=title_as_heading,
                    global_vars=global_vars,
                    snippets_dir=snippets_dir,
-                   path_prefix=path_prefix)
+                   path_prefix=path_prefix,
+                   jobs=jobs,
+                   io_jobs=io_jobs,
+                   cache_dir=cache_dir,
+                   freshness=freshness,
+                   publish=publish,
+                   html_parser=html_parser)
 
 
 def _get_path(base_path: Optional[str], args: Namespace, config: dict, name: str, *, silent: bool = False,
-              ensure_dir: bool = False, ensure_file: bool = False) -> Optional[str]:
+              ensure_dir: bool = False, ensure_file: bool = False, allow_empty: bool = False) -> Optional[str]:
     value = getattr(args, name)
-    if value is None:
+    explicit = value is not None
+    if not explicit:
+        explicit = name in config
         value = config.get(name)
+    if allow_empty and explicit and not value:
+        # An empty value disables the option instead of falling back to the default.
+        return None
     option = OPTIONS[name]
     if value:
         path = abspath(base_path, value)
@@ -247,6 +310,18 @@ def _get_string(args: Namespace, config: dict, name: str) -> str:
     if value is None:
         value = OPTIONS[name].default
     assert isinstance(value, str), f'Unexpected type instead of string: {type(value)}.'
+    choices = OPTIONS[name].choices
+    assert not choices or value in choices, f'{name}: Unexpected value "{value}", choose from {choices}.'
+    return value
+
+
+def _get_int(args: Namespace, config: dict, name: str) -> int:
+    value = getattr(args, name, None)
+    if value is None:
+        value = config.get(name)
+    if value is None:
+        value = OPTIONS[name].default
+    assert isinstance(value, int) and not isinstance(value, bool), f'Unexpected type instead of int: {type(value)}.'
     return value
 
 
@@ -4,6 +4,10 @@
 import os
 from typing import Optional, List
 
+from fxwebgen.parsers import HTML_PARSER_PYTHON
+from fxwebgen.profiler import Profiler
+from fxwebgen.publish import PUBLISH_AUTO
+from fxwebgen.resources import FRESHNESS_MTIME
 from fxwebgen.templater import Templater
 from fxwebgen.typing import StrDict, StrStrDict
 
@@ -17,6 +21,10 @@ class Context:
     static_dirs: List[str]
     datasets_dir: Optional[str]
     snippets_dir: Optional[str]
+    cache_dir: Optional[str]
+    freshness: str
+    publish: str
+    html_parser: str
     datasets: StrDict
     default_template: str
     enable_snippets: bool
@@ -25,6 +33,9 @@ class Context:
     interlinks: StrStrDict
     path_prefix: str
     global_vars: dict
+    jobs: int
+    io_jobs: int
+    profiler: Profiler
 
     def __init__(self, templater: Templater, output_root: str, *,
                  pages_dir: Optional[str] = None,
@@ -38,8 +49,20 @@ class Context:
                  title_as_heading: bool = False,
                  default_template: Optional[str] = None,
                  global_vars: Optional[dict] = None,
-                 path_prefix: Optional[str] = None) -> None:
+                 path_prefix: Optional[str] = None,
+                 jobs: int = 1,
+                 io_jobs: int = 8,
+                 cache_dir: Optional[str] = None,
+                 freshness: Optional[str] = None,
+                 publish: Optional[str] = None,
+                 html_parser: Optional[str] = None,
+                 profiler: Optional[Profiler] = None) -> None:
         self.snippets_dir = snippets_dir
+        self.cache_dir = cache_dir
+        self.freshness = freshness or FRESHNESS_MTIME
+        self.publish = publish or PUBLISH_AUTO
+        self.html_parser = html_parser or HTML_PARSER_PYTHON
+        self.profiler = profiler or Profiler()
         self.global_vars = global_vars if global_vars is not None else {}
         self.datasets_dir = datasets_dir
         self.static_dirs = static_dirs or []
@@ -54,3 +77,5 @@ class Context:
         self.interlinks = interlinks or {}
         self.path_prefix = path_prefix.strip('/') if path_prefix else ''
         self.output_dir = os.path.join(self.output_root, self.path_prefix)
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.io_jobs = max(1, io_jobs)
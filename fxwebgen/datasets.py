@@ -0,0 +1,221 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+import marshal
+import os
+import sys
+from typing import Any, Dict, List, Tuple, Optional, Iterator, Callable, Mapping, NoReturn
+
+from fxwebgen.fingerprints import Fingerprints, hash_data
+
+# The marshal format is specific to a Python version.
+CACHE_SUFFIX = f'.py{sys.version_info[0]}{sys.version_info[1]}-{marshal.version}.marshal'
+
+
+class Datasets:
+    datasets_dir: str
+    cache_dir: Optional[str]
+    fingerprints: Fingerprints
+    loaded: Dict[str, Tuple[str, Any]]
+
+    def __init__(self, datasets_dir: str, cache_dir: Optional[str] = None,
+                 fingerprints: Optional[Fingerprints] = None) -> None:
+        self.datasets_dir = datasets_dir
+        self.cache_dir = cache_dir
+        self.fingerprints = fingerprints or Fingerprints()
+        self.loaded = {}
+
+    def get_path(self, name: str) -> str:
+        return os.path.join(self.datasets_dir, name + ".json")
+
+    def get_cache_path(self, name: str) -> str:
+        # There is a single cache entry per dataset, which is replaced when the dataset changes.
+        assert self.cache_dir
+        return os.path.join(self.cache_dir, name + CACHE_SUFFIX)
+
+    def get(self, name: str) -> Any:
+        # Datasets are checked for changes on each access, so that edited datasets are used in the serve mode.
+        path = self.get_path(name)
+        digest = self.fingerprints.digest(path)
+        try:
+            loaded_digest, data = self.loaded[name]
+        except KeyError:
+            pass
+        else:
+            if digest and loaded_digest == digest:
+                return data
+        digest, data = self.load(name, digest)
+        data = freeze(data)
+        self.loaded[name] = digest, data
+        return data
+
+    def load(self, name: str, digest: Optional[str] = None) -> Tuple[str, Any]:
+        if digest and self.cache_dir:
+            try:
+                # marshal.load() reads a file in small chunks, which is several times slower than marshal.loads().
+                with open(self.get_cache_path(name), 'rb') as fh:
+                    cached_digest, data = marshal.loads(fh.read())
+                if cached_digest == digest:
+                    return digest, data
+            except (OSError, EOFError, ValueError, TypeError):
+                pass
+        with open(self.get_path(name), 'rb') as fh:
+            source = fh.read()
+        # The digest of the data that has been actually read is used, the file might have changed in the meantime.
+        digest = hash_data(source)
+        data = json.loads(source)
+        if self.cache_dir:
+            self.store(name, digest, data)
+        return digest, data
+
+    def store(self, name: str, digest: str, data: Any) -> None:
+        cache_path = self.get_cache_path(name)
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(tmp_path, 'wb') as fh:
+                fh.write(marshal.dumps((digest, data)))
+            os.replace(tmp_path, cache_path)
+        except (OSError, ValueError) as e:
+            print(f'Warning: Failed to cache dataset: {e}')
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def freeze(data: Any) -> Any:
+    # Datasets are shared by all pages, so templates get read-only copies. They are subclasses of dict and list,
+    # so that they serialize, compare and concatenate like the plain containers. Only the top level is copied,
+    # nested containers are frozen on the first access, so that loading of large datasets stays cheap.
+    if isinstance(data, (FrozenDict, FrozenList)):
+        return data
+    if isinstance(data, dict):
+        return FrozenDict(data)
+    if isinstance(data, list):
+        return FrozenList(data)
+    return data
+
+
+def _read_only(*_args: Any, **_kwargs: Any) -> NoReturn:
+    raise TypeError('Datasets are read-only.')
+
+
+class FrozenDict(dict):
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __getitem__(self, key: Any) -> Any:
+        value = dict.__getitem__(self, key)
+        frozen = freeze(value)
+        if frozen is not value:
+            dict.__setitem__(self, key, frozen)
+        return frozen
+
+    def __iter__(self) -> Iterator[Any]:
+        # An overridden __iter__ disables the fast path of dict(), which would copy the values not frozen yet.
+        return dict.__iter__(self)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def values(self) -> Any:
+        self._freeze_all()
+        return dict.values(self)
+
+    def items(self) -> Any:
+        self._freeze_all()
+        return dict.items(self)
+
+    def copy(self) -> Dict[Any, Any]:
+        self._freeze_all()
+        return dict.copy(self)
+
+    def _freeze_all(self) -> None:
+        for key, value in dict.items(self):
+            frozen = freeze(value)
+            if frozen is not value:
+                dict.__setitem__(self, key, frozen)
+
+    def __reduce__(self) -> Tuple[type, Tuple[dict]]:
+        return FrozenDict, (self.copy(),)
+
+    def __repr__(self) -> str:
+        self._freeze_all()
+        return f'FrozenDict({dict.__repr__(self)})'
+
+
+class FrozenList(list):
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return FrozenList(list.__getitem__(self, index))
+        value = list.__getitem__(self, index)
+        frozen = freeze(value)
+        if frozen is not value:
+            list.__setitem__(self, index, frozen)
+        return frozen
+
+    def __iter__(self) -> Iterator[Any]:
+        self._freeze_all()
+        return list.__iter__(self)
+
+    def __reversed__(self) -> Iterator[Any]:
+        self._freeze_all()
+        return list.__reversed__(self)
+
+    def __add__(self, other: Any) -> Any:
+        self._freeze_all()
+        return list.__add__(self, other)
+
+    def __radd__(self, other: Any) -> Any:
+        self._freeze_all()
+        return other + list(self)
+
+    def __mul__(self, count: Any) -> Any:
+        self._freeze_all()
+        return list.__mul__(self, count)
+
+    __rmul__ = __mul__
+
+    def copy(self) -> List[Any]:
+        self._freeze_all()
+        return list.copy(self)
+
+    def _freeze_all(self) -> None:
+        for index, value in enumerate(list.__iter__(self)):
+            frozen = freeze(value)
+            if frozen is not value:
+                list.__setitem__(self, index, frozen)
+
+    def __reduce__(self) -> Tuple[type, Tuple[list]]:
+        return FrozenList, (self.copy(),)
+
+    def __repr__(self) -> str:
+        self._freeze_all()
+        return f'FrozenList({list.__repr__(self)})'
+
+
+class LazyMapping(Mapping[str, Any]):
+    loaders: Dict[str, Callable[[], Any]]
+    loaded: Dict[str, Any]
+
+    def __init__(self, loaders: Dict[str, Callable[[], Any]]) -> None:
+        self.loaders = loaders
+        self.loaded = {}
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self.loaded[key]
+        except KeyError:
+            value = self.loaded[key] = self.loaders[key]()
+            return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.loaders)
+
+    def __len__(self) -> int:
+        return len(self.loaders)
@@ -0,0 +1,61 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import hashlib
+import mmap
+import os
+from typing import Dict, Tuple, Optional, Iterable
+
+MMAP_THRESHOLD = 1024 * 1024
+DIGEST_SIZE = 20
+
+FingerprintEntry = Tuple[int, int, int, str]  # pylint: disable=invalid-name
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    with open(path, 'rb') as fh:
+        size = os.fstat(fh.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                digest.update(data)
+        elif size:
+            digest.update(fh.read())
+    return digest.hexdigest()
+
+
+def hash_data(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
+class Fingerprints:
+    entries: Dict[str, FingerprintEntry]
+
+    def __init__(self) -> None:
+        self.entries = {}
+
+    def digest(self, path: str) -> Optional[str]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.entries.pop(path, None)
+            return None
+        entry = self.entries.get(path)
+        if entry and entry[:3] == (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            return entry[3]
+        try:
+            digest = hash_file(path)
+        except OSError:
+            return None
+        self.entries[path] = stat.st_size, stat.st_mtime_ns, stat.st_ino, digest
+        return digest
+
+    def update(self, entries: Iterable[Tuple[str, int, int, int, str]]) -> None:
+        for path, size, mtime_ns, inode, digest in entries:
+            self.entries[path] = size, mtime_ns, inode, digest
+
+    def forget(self, path: str) -> None:
+        self.entries.pop(path, None)
+
+    def clear(self) -> None:
+        self.entries.clear()
@@ -1,17 +1,28 @@
 # Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
-import json
-from typing import List, Any, Optional, Dict, Type, ClassVar
+import functools
+import hashlib
+import multiprocessing
+from typing import List, Any, Optional, Dict, Type, ClassVar, Tuple, Iterator, Iterable, Callable, Set
 import os
+import re
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 from fxwebgen import imaging
 from fxwebgen.context import Context
-from fxwebgen.objects import Thumbnail
+from fxwebgen.datasets import Datasets, LazyMapping, freeze
+from fxwebgen.fingerprints import Fingerprints, hash_file
+from fxwebgen.objects import Thumbnail, PageResult
 from fxwebgen.pages import MarkdownPage, HtmlPage, Page
 from fxwebgen.postprocessor import PostProcessor
-from fxwebgen.resources import ResourceManager
+from fxwebgen.profiler import CATEGORY_PAGE
+from fxwebgen.publish import Publisher, UNCHANGED
+from fxwebgen.resources import ResourceManager, Resource, FRESHNESS_CONTENT
+from fxwebgen.state import BuildState
+from fxwebgen.thumbnail_cache import ThumbnailCache
+from fxwebgen.typing import StrDict
 
 FORCE_ALL = 'all'
 FORCE_PAGES = 'pages'
@@ -19,44 +30,134 @@ FORCE_THUMBNAILS = 'thumbnails'
 FORCE_STATIC_FILES = 'static_files'
 FORCE_TEMPLATE = 'template'
 FORCE_REBUILD_CHOICES: List[str] = [FORCE_ALL, FORCE_PAGES, FORCE_THUMBNAILS, FORCE_STATIC_FILES, FORCE_TEMPLATE]
+PAGE_EXTENSIONS = ('.md', '.html')
+WRITE_BUFFER_SIZE = 64 * 1024
+SNIPPET_RE = re.compile(r'\[[Ss]nippet: ([^\]]+)\]')
 
 
+# pylint: disable=too-many-instance-attributes
 class Generator:
     ctx: Context
     post_processor: PostProcessor
     page_factories: ClassVar[List[Type[Page]]] = [MarkdownPage, HtmlPage]
     thumbnails: Dict[str, Dict[str, Thumbnail]]
+    pages: Dict[str, StrDict]
     resources: ResourceManager
+    state: Optional[BuildState]
+    state_loaded: bool
+    fingerprints: Fingerprints
+    thumbnail_cache: Optional[ThumbnailCache]
+    publisher: Publisher
+    datasets: Optional[Datasets]
+    frozen_datasets: Dict[str, Tuple[Any, Any]]
+    snippets: Dict[str, Tuple[Set[str], str]]
 
     def __init__(self, ctx: Context, *,
                  post_processor: Optional[PostProcessor] = None,
-                 resources: Optional[ResourceManager] = None) -> None:
+                 resources: Optional[ResourceManager] = None,
+                 state: Optional[BuildState] = None) -> None:
         self.ctx = ctx
         self.post_processor = post_processor or PostProcessor()
         self.thumbnails = {}
-        self.resources = resources or ResourceManager()
+        self.pages = {}
+        self.resources = resources or ResourceManager(
+            Fingerprints() if ctx.freshness == FRESHNESS_CONTENT else None)
+        self.state = state or self._create_state()
+        self.state_loaded = False
+        self.fingerprints = self.resources.fingerprints or Fingerprints()
+        self.thumbnail_cache = ThumbnailCache(os.path.join(ctx.cache_dir, 'thumbnails')) if ctx.cache_dir else None
+        self.publisher = Publisher(ctx.publish, self.fingerprints)
+        self.snippets = {}
+        self.datasets = Datasets(ctx.datasets_dir, os.path.join(ctx.cache_dir, 'datasets') if ctx.cache_dir else None,
+                                 self.fingerprints) if ctx.datasets_dir else None
+        self.frozen_datasets = {}
         self.pages_kind = self.resources.add_kind('pages')
         self.static_files_kind = self.resources.add_kind('static_files')
         self.thumbnails_kind = self.resources.add_kind('thumbnails')
 
+    def _create_state(self) -> Optional[BuildState]:
+        ctx = self.ctx
+        if not ctx.cache_dir:
+            return None
+        output_id = hashlib.sha1(ctx.output_dir.encode('utf-8')).hexdigest()[:16]
+        return BuildState(os.path.join(ctx.cache_dir, f'build-{output_id}.sqlite'), {
+            'output_dir': ctx.output_dir,
+            'pages_dir': ctx.pages_dir,
+            'static_dirs': ctx.static_dirs,
+        })
+
     def purge(self) -> None:
         if os.path.isdir(self.ctx.output_dir):
             shutil.rmtree(self.ctx.output_dir, ignore_errors=True)
+        if self.state:
+            self.state.clear()
+
+    def load_state(self) -> None:
+        self.state_loaded = True
+        if self.state and self.state.load():
+            self.resources.digests.update(self.state.digests)
+            self.resources.checked.update(self.state.checked)
+            if self.resources.fingerprints is not None:
+                self.resources.fingerprints.update(self.state.fingerprints)
+            kinds = {kind.name: kind for kind in self.resources.kinds}
+            # The targets of the previous build are used to find stale files without walking the output directory.
+            self.resources.index = {target for _kind, _source, target in self.state.resources}
+            for kind_name, source, target in self.state.resources:
+                kind = kinds.get(kind_name)
+                if kind and target not in self.resources.targets:
+                    self.resources.add(kind, source, target, self.state.dependencies.get(target))
+            for source, thumbnails in self.state.thumbnails.items():
+                self.thumbnails.setdefault(source, thumbnails)
+            for source, metadata in self.state.pages.items():
+                self.pages.setdefault(source, metadata)
+
+    def save_state(self) -> None:
+        state = self.state
+        if state:
+            resources = self.resources.targets.values()
+            state.resources = [(item.kind.name, item.source, item.target) for item in resources]
+            state.dependencies = {item.target: item.dependencies for item in resources if item.dependencies}
+            state.digests = {item.target: item.digests for item in resources if item.digests}
+            state.checked = {item.target: item.checked for item in resources if item.checked is not None}
+            fingerprints = self.resources.fingerprints
+            entries = fingerprints.entries.items() if fingerprints else ()
+            state.fingerprints = [(path,) + entry for path, entry in entries]
+            state.thumbnails = self.thumbnails
+            state.pages = self.pages
+            state.save()
 
-    def build(self, force: Optional[List[str]] = None) -> None:
+    def build(self, force: Optional[List[str]] = None, *, deep_clean: bool = False) -> None:
         if force is None:
             force = []
         elif FORCE_ALL in force:
             force = FORCE_REBUILD_CHOICES
-        self.before_building_pages()
-        if FORCE_TEMPLATE in force:
-            self.ctx.templater.clear_cache()
-            force.append(FORCE_PAGES)
-        self.build_pages(force=FORCE_PAGES in force)
-        self.after_building_pages()
-        self.generate_thumbnails(force=FORCE_THUMBNAILS in force)
-        self.copy_static_files(force=FORCE_STATIC_FILES in force)
-        self.remove_stale_files()
+        profiler = self.ctx.profiler
+        profiler.clear()
+        with profiler.measure('build'):
+            if not self.state_loaded:
+                with profiler.measure('load_state'):
+                    self.load_state()
+            # Stat results are shared by all freshness checks of a single build.
+            self.resources.scanner.clear()
+            self.snippets.clear()
+            MarkdownPage.get_converters(self.ctx).clear_cache()
+            self.before_building_pages()
+            if FORCE_TEMPLATE in force:
+                self.ctx.templater.clear_cache()
+                force.append(FORCE_PAGES)
+            with profiler.measure('build_pages'):
+                self.build_pages(force=FORCE_PAGES in force)
+            self.after_building_pages()
+            with profiler.measure('generate_thumbnails'):
+                self.generate_thumbnails(force=FORCE_THUMBNAILS in force)
+            with profiler.measure('copy_static_files'):
+                self.copy_static_files(force=FORCE_STATIC_FILES in force)
+            with profiler.measure('remove_stale_files'):
+                self.remove_stale_files(deep=deep_clean)
+            with profiler.measure('save_state'):
+                self.save_state()
+        if profiler.enabled:
+            profiler.save()
 
     def before_building_pages(self) -> None:
         pass
@@ -68,36 +169,88 @@ class Generator:
         kind = self.pages_kind
         old_pages = {item.source: item for item in kind.resources}
         old_thumbnails = self.thumbnails
+        old_metadata = self.pages
         self.thumbnails = {}
+        self.pages = {}
         self.resources.remove_by_kind(kind)
         assert self.ctx.pages_dir
-        for root, _dirs, files in os.walk(self.ctx.pages_dir):
+        jobs = []
+        for root, _dirs, files in self.resources.scanner.walk(self.ctx.pages_dir):
             for path in files:
-                if path.endswith(('.md', '.html', '.html')):
+                if path.endswith(PAGE_EXTENSIONS):
                     path = os.path.join(root, path)
                     resource = old_pages.get(path)
                     if not force and resource and resource.fresh:
                         self.thumbnails[path] = old_thumbnails.get(path, {})
-                        self.resources.add(kind, resource.source, resource.target)
+                        self.pages[path] = old_metadata.get(path, {})
+                        self.resources.add(kind, resource.source, resource.target, resource.dependencies)
                     else:
-                        default_path = path[len(self.ctx.pages_dir):]
-                        page = self.parse_page(path, default_path)
-                        self.thumbnails[page.source] = page.thumbnails
-                        assert page.target
-                        resource = self.resources.add(kind, page.source, page.target)
-                        if force or not resource.fresh:
-                            self.build_page(page)
+                        # A known page that is not fresh has changed or one of its dependencies has changed.
+                        jobs.append((path, path[len(self.ctx.pages_dir):], force or resource is not None))
+        self._add_page_results(self._map_pages(jobs))
+
+    def _add_page_results(self, results: Iterable[PageResult]) -> None:
+        stats: Dict[str, int] = {}
+        for result in results:
+            self._add_page_result(result)
+            if result.built:
+                name = UNCHANGED if result.unchanged else 'written'
+                stats[name] = stats.get(name, 0) + 1
+        if stats:
+            print('Pages: ' + ', '.join(f'{count}× {name}' for name, count in sorted(stats.items())))
+
+    def _add_page_result(self, result: PageResult) -> None:
+        for warning in result.warnings:
+            print(warning)
+        self.ctx.profiler.extend(result.events)
+        self.thumbnails[result.source] = result.thumbnails
+        self.pages[result.source] = result.metadata
+        resource = self.resources.add(self.pages_kind, result.source, result.target, result.dependencies)
+        if result.unchanged:
+            self.resources.kept(resource)
+        elif result.built:
+            self.resources.built(resource)
+
+    def _map_pages(self, jobs: List[Tuple[str, str, bool]]) -> Iterator[PageResult]:
+        n_workers = min(self.ctx.jobs, len(jobs))
+        if n_workers < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+            for job in jobs:
+                yield self.process_page(*job)
+        else:
+            # Workers are forked to inherit the warm templater and other state without pickling it.
+            with multiprocessing.get_context('fork').Pool(n_workers, _init_worker, (self,)) as pool:
+                yield from pool.imap(_process_page_in_worker, jobs, chunksize=max(1, len(jobs) // (4 * n_workers)))
+
+    def process_page(self, source: str, default_path: str, force: bool = False) -> PageResult:
+        profiler = self.ctx.profiler
+        mark = profiler.mark()
+        with profiler.measure('process_page', CATEGORY_PAGE, source):
+            page = self.parse_page(source, default_path)
+            try:
+                assert page.target
+                metadata = dict(page.metadata)
+                resource = self.resources.add(self.pages_kind, page.source, page.target, page.dependencies)
+                built = force or not resource.fresh
+                unchanged = built and not self.build_page(page)
+            finally:
+                page.close()
+        return PageResult(page.source, page.target, metadata, page.thumbnails, page.toc, page.warnings,
+                          page.dependencies, built, unchanged, profiler.take(mark))
 
     def parse_page(self, source: str, default_path: str) -> Page:
-        page = self._process_source(source, default_path)
+        with self.ctx.profiler.measure('process_source', page=source):
+            page = self._process_source(source, default_path)
         self._process_metadata(page)
         return page
 
-    def build_page(self, page: Page) -> Page:
-        self._load_datasets_for_page(page)
-        self._process_page(page)
-        self._write_page(page)
-        return page
+    def build_page(self, page: Page) -> bool:
+        profiler = self.ctx.profiler
+        with profiler.measure('load_datasets', page=page.source):
+            self._load_datasets_for_page(page)
+        with profiler.measure('post_process', page=page.source):
+            self._process_page(page)
+        with profiler.measure('write_page', page=page.source):
+            return self._write_page(page)
 
     def _process_source(self, source: str, default_path: str) -> Page:
         page = None
@@ -118,14 +271,14 @@ class Generator:
         url_deprecated = None
         if 'url' in meta:
             url_deprecated = meta['url']
-            print(f'Warning: "URL: {url_deprecated}" meta directive is deprecated.')
+            page.warn(f'"URL: {url_deprecated}" meta directive is deprecated.')
             if not url_deprecated.startswith('/'):
                 url_deprecated = '/' + url_deprecated
 
         save_as_deprecated = None
         if 'save_as' in meta:
             save_as_deprecated = meta['save_as']
-            print(f'Warning: "save_as: {save_as_deprecated}" meta directive is deprecated.')
+            page.warn(f'"save_as: {save_as_deprecated}" meta directive is deprecated.')
 
         path = meta.get('path', url_deprecated or page.default_path)
         if not path.startswith('/'):
@@ -148,13 +301,16 @@ class Generator:
     def _load_datasets_for_page(self, page: Page) -> None:
         meta = page.metadata
 
-        datasets = {}
+        datasets: Dict[str, Callable[[], Any]] = {}
         for name in meta.get('datasets', '').split(','):
             name = name.strip()
             if name:
                 name = name.lower().replace(' ', '_').replace('-', '_')
-                datasets[name] = self.get_dataset(name)
-        meta['datasets'] = datasets
+                datasets[name] = functools.partial(self.get_dataset, name)
+                if self.ctx.datasets_dir:
+                    page.dependencies.add(self.get_dataset_path(name))
+        # Datasets are loaded only when they are used by a template.
+        meta['datasets'] = LazyMapping(datasets)
 
         snippets: Dict[str, str] = {}
         if self.ctx.enable_snippets:
@@ -162,22 +318,41 @@ class Generator:
                 original_name = original_name.strip()
                 normalized_name = original_name.lower().replace(' ', '_').replace('-', '_')
                 if original_name and normalized_name not in snippets:
-                    snippets[original_name] = snippets[normalized_name] = self.ctx.templater.render(
-                        [f'snippets/{normalized_name}.html'], meta)
+                    template = [f'snippets/{normalized_name}.html']
+                    snippets[original_name] = snippets[normalized_name] = self._render_snippet(template, meta)
+                    page.dependencies.update(self.ctx.templater.get_dependencies(template))
         meta['snippets'] = snippets
 
+    def _render_snippet(self, template: List[str], meta: StrDict) -> str:
+        templater = self.ctx.templater
+        try:
+            cached_variables, result = self.snippets[template[0]]
+        except KeyError:
+            pass
+        else:
+            # Page metadata override global variables of the same name.
+            if not cached_variables.intersection(meta):
+                return result
+        result = templater.render(template, meta)
+        # A snippet that uses only global variables and its template data is the same for all pages,
+        # so it is rendered only once per build.
+        variables = templater.get_undeclared_variables(template)
+        if variables is not None:
+            variables.discard('data')
+            if variables.issubset(templater.env.globals) and not variables.intersection(meta):
+                self.snippets[template[0]] = variables, result
+        return result
+
     def _process_page(self, page: Page) -> None:
         meta = page.metadata
-        body = page.body or ''
-        if self.ctx.enable_snippets:
-            snippets: Dict[str, str] = meta['snippets']
-            for name, content in snippets.items():
-                body = body.replace(f'[Snippet: {name}]', content)
-                body = body.replace(f'[snippet: {name}]', content)
-        page.body = body
+        snippets: Dict[str, str] = meta['snippets'] if self.ctx.enable_snippets else {}
+        if snippets:
+            # Snippets are substituted in the serialized body.
+            page.serialize()
+            page.body = SNIPPET_RE.sub(lambda m: snippets.get(m.group(1), m.group(0)), page.body or '')
         self.post_processor.process_page(self.ctx, page)
 
-    def _write_page(self, page: Page) -> None:
+    def _write_page(self, page: Page) -> bool:
         template = page.metadata['template']
         target = page.target
         assert target
@@ -187,47 +362,189 @@ class Generator:
         variables['body'] = page.body
         variables['toc'] = page.toc
         os.makedirs(os.path.dirname(target), exist_ok=True)
-        with open(target, "wt") as fh:
-            fh.write(self.ctx.templater.render(template + '.html', variables))
+        tmp_path = target + '.tmp'
+        try:
+            with open(tmp_path, "wt", buffering=WRITE_BUFFER_SIZE) as fh:
+                fh.writelines(self.ctx.templater.generate(template + '.html', variables))
+            page.dependencies.update(self.ctx.templater.get_dependencies(template + '.html'))
+            # A target with the same content is left untouched, so that its mtime does not change.
+            unchanged = (os.path.isfile(target) and os.path.getsize(target) == os.path.getsize(tmp_path)
+                         and self.fingerprints.digest(target) == hash_file(tmp_path))
+            if unchanged:
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return not unchanged
 
     def copy_static_files(self, *, force: bool = False) -> None:
         kind = self.static_files_kind
         self.resources.remove_by_kind(kind)
+        self.publisher.reset()
+        resources = []
         for static_dir in self.ctx.static_dirs:
             target_dir = os.path.join(self.ctx.output_dir, os.path.basename(static_dir))
             print(f'Dir: "{static_dir}" → "{target_dir}"')
             os.makedirs(target_dir, exist_ok=True)
             prefix_len = len(static_dir) + 1
-            for source_root, dirs, files in os.walk(static_dir):
+            for source_root, dirs, files in self.resources.scanner.walk(static_dir):
                 target_root = os.path.join(target_dir, source_root[prefix_len:])
                 for path in files:
-                    source = os.path.join(source_root, path)
-                    target = os.path.join(target_root, path)
-                    resource = self.resources.add(kind, source, target)
-                    if force or not resource.fresh:
-                        shutil.copy2(source, target)
+                    resources.append(self.resources.add(
+                        kind, os.path.join(source_root, path), os.path.join(target_root, path)))
                 for path in dirs:
                     target = os.path.join(target_root, path)
                     os.makedirs(target, exist_ok=True)
+        # The resources are registered above in a deterministic order, only the I/O is done concurrently.
+        n_workers = min(self.ctx.io_jobs, len(resources))
+        if n_workers < 2:
+            for resource in resources:
+                self._publish_static_file(resource, force)
+        else:
+            with ThreadPoolExecutor(n_workers) as executor:
+                for future in [executor.submit(self._publish_static_file, resource, force) for resource in resources]:
+                    future.result()
+        stats = self.publisher.stats
+        if stats:
+            print('Published: ' + ', '.join(f'{count}× {name}' for name, count in sorted(stats.items())))
+
+    def _copy_static_file(self, source: str, target: str, force: bool = False) -> None:
+        self._publish_static_file(self.resources.add(self.static_files_kind, source, target), force)
+
+    def _publish_static_file(self, resource: Resource, force: bool) -> None:
+        if force or not resource.fresh:
+            with self.ctx.profiler.measure('publish_static_file'):
+                result = self.publisher.publish(resource.source, resource.target)
+            if result == UNCHANGED:
+                self.resources.kept(resource)
+            else:
+                self.resources.built(resource)
+        else:
+            self.publisher.add(resource.source, resource.target)
+
+    def get_source_dirs(self) -> List[str]:
+        ctx = self.ctx
+        dirs = [ctx.pages_dir, ctx.templater.template_dir, ctx.snippets_dir, ctx.datasets_dir] + ctx.static_dirs
+        return [path for path in dirs if path]
+
+    def update(self, paths: Iterable[str]) -> None:
+        # Changed pages and static files are processed one by one, any other change results in a regular build,
+        # which relies on the dependency tracking.
+        pages_dir = self.ctx.pages_dir
+        jobs: List[Tuple[str, str, bool]] = []
+        static_files: List[Tuple[str, str]] = []
+        removed_pages: List[str] = []
+        self.resources.scanner.clear()
+        MarkdownPage.get_converters(self.ctx).clear_cache()
+        for path in sorted(set(paths)):
+            static_dir = self._find_static_dir(path)
+            if pages_dir and path.startswith(pages_dir + '/'):
+                self._collect_page_changes(pages_dir, path, jobs, removed_pages)
+            elif static_dir:
+                if os.path.isfile(path) or path in self.resources.sources:
+                    static_files.append((static_dir, path))
+            elif not os.path.isdir(path) or path in self.get_source_dirs():
+                print(f'Changed: {path}')
+                self.build()
+                return
+        # A page may be reported both on its own and as a part of a moved directory.
+        jobs = list({job[0]: job for job in jobs}.values())
+        profiler = self.ctx.profiler
+        profiler.clear()
+        with profiler.measure('update'):
+            with profiler.measure('build_pages'):
+                self._add_page_results(self._map_pages(jobs))
+                for path in removed_pages:
+                    self._remove_page(path)
+            with profiler.measure('copy_static_files'):
+                for static_dir, path in static_files:
+                    self._update_static_file(static_dir, path)
+            with profiler.measure('generate_thumbnails'):
+                self.generate_thumbnails()
+            if removed_pages:
+                with profiler.measure('remove_stale_files'):
+                    self.remove_stale_files()
+            with profiler.measure('save_state'):
+                self.save_state()
+        if profiler.enabled:
+            profiler.save()
+
+    def _collect_page_changes(self, pages_dir: str, path: str, jobs: List[Tuple[str, str, bool]],
+                              removed_pages: List[str]) -> None:
+        if os.path.isdir(path):
+            # A directory moved into the tree is reported as a single event.
+            for root, _dirs, files in os.walk(path):
+                for name in files:
+                    if name.endswith(PAGE_EXTENSIONS):
+                        source = os.path.join(root, name)
+                        jobs.append((source, source[len(pages_dir):], True))
+        elif path.endswith(PAGE_EXTENSIONS) and os.path.isfile(path):
+            jobs.append((path, path[len(pages_dir):], True))
+        else:
+            # So is a directory moved out of the tree, which removes all pages under it.
+            # Other files in the pages directory, e.g. editor backups, are not used.
+            removed_pages.extend(source for source in self.pages if source == path or source.startswith(path + '/'))
+
+    def _find_static_dir(self, path: str) -> Optional[str]:
+        for static_dir in self.ctx.static_dirs:
+            if path.startswith(static_dir + '/'):
+                return static_dir
+        return None
+
+    def _remove_page(self, source: str) -> None:
+        self.thumbnails.pop(source, None)
+        self.pages.pop(source, None)
+        for resource in list(self.resources.sources.get(source, ())):
+            if resource.kind is self.pages_kind:
+                self.resources.remove(resource)
+                if os.path.isfile(resource.target):
+                    print(f'Remove: {resource.target}')
+                    os.remove(resource.target)
+
+    def _update_static_file(self, static_dir: str, source: str) -> None:
+        target = os.path.join(self.ctx.output_dir, os.path.basename(static_dir), source[len(static_dir) + 1:])
+        if os.path.isfile(source):
+            print(f'Static file: "{source}" → "{target}"')
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            self._copy_static_file(source, target)
+        else:
+            resource = self.resources.targets.get(target)
+            if resource:
+                self.resources.remove(resource)
+            if os.path.isfile(target):
+                print(f'Remove: {target}')
+                os.remove(target)
+
+    def get_dataset_path(self, name: str) -> str:
+        assert self.datasets
+        return self.datasets.get_path(name)
 
     def get_dataset(self, name: str) -> Any:
+        # Datasets provided by the context take precedence over the datasets dir.
         try:
-            return self.ctx.datasets[name]
+            value = self.ctx.datasets[name]
         except KeyError:
-            if self.ctx.datasets_dir:
-                path = os.path.join(self.ctx.datasets_dir, name + ".json")
-                with open(path) as fh:
-                    dataset = json.load(fh)
-            else:
-                dataset = None
-            self.ctx.datasets[name] = dataset
-            return dataset
+            return self.datasets.get(name) if self.datasets else None
+        # They get the same read-only copies, which are made again only if the dataset is replaced.
+        try:
+            original, frozen = self.frozen_datasets[name]
+            if original is value:
+                return frozen
+        except KeyError:
+            pass
+        frozen = freeze(value)
+        self.frozen_datasets[name] = value, frozen
+        return frozen
 
     def generate_thumbnails(self, *, force: bool = False) -> None:
         kind = self.thumbnails_kind
         self.resources.remove_by_kind(kind)
         static_dirs = self.ctx.static_dirs
         output_dir = self.ctx.output_dir
+        jobs: Dict[str, Tuple[Resource, Thumbnail]] = {}
         for thumbnails in self.thumbnails.values():
             for thumbnail in thumbnails.values():
                 for static_dir in static_dirs:
@@ -236,13 +553,81 @@ class Generator:
                         source = os.path.join(static_dir, thumbnail.original_url[len(prefix):])
                         target = os.path.join(output_dir, thumbnail.filename)
                         resource = self.resources.add(kind, source, target)
-                        if force or not resource.fresh:
-                            print(f'Thumbnail: {source} → {target}.')
-                            os.makedirs(os.path.dirname(target), exist_ok=True)
-                            imaging.create_thumbnail(source, target, thumbnail.width, thumbnail.height)
+                        if target not in jobs and (force or not resource.fresh):
+                            jobs[target] = resource, thumbnail
                         break
                 else:
                     raise ValueError(f'Cannot find {thumbnail.original_url}.')
 
-    def remove_stale_files(self) -> None:
-        self.resources.remove_stale_files(self.ctx.output_root)
+        self._create_thumbnails(list(jobs.values()), force)
+
+    def _create_thumbnails(self, jobs: List[Tuple[Resource, Thumbnail]], force: bool) -> None:
+        # Group the thumbnails by source to decode each original image only once.
+        tasks: Dict[str, List[imaging.ThumbnailSpec]] = {}
+        outputs: Dict[str, List[Resource]] = {}
+        cached_paths: Dict[str, str] = {}
+        cache = self.thumbnail_cache
+        for resource, thumbnail in jobs:
+            source, target = resource.source, resource.target
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            output = target
+            digest = self.fingerprints.digest(source) if cache else None
+            if cache and digest:
+                cached = cache.get_path(digest, thumbnail.width, thumbnail.height, os.path.splitext(target)[1])
+                if not force and os.path.isfile(cached):
+                    print(f'Thumbnail: {source} → {target} (cached).')
+                    cache.install(cached, target)
+                    self.resources.built(resource)
+                    continue
+                output = cache.prepare(cached)
+                cached_paths[output] = cached
+            print(f'Thumbnail: {source} → {target}.')
+            if output not in outputs:
+                # Identical images of the same size are encoded only once.
+                outputs[output] = []
+                tasks.setdefault(source, []).append((output, thumbnail.width, thumbnail.height))
+            outputs[output].append(resource)
+        for done in self._map_thumbnails(list(tasks.items())):
+            for output in done:
+                cached_path = cached_paths.get(output)
+                if cache and cached_path:
+                    cache.store(output, cached_path)
+                for resource in outputs[output]:
+                    if cache and cached_path:
+                        cache.install(cached_path, resource.target)
+                    self.resources.built(resource)
+
+    def _map_thumbnails(self, tasks: List[Tuple[str, List[imaging.ThumbnailSpec]]]) -> Iterator[List[str]]:
+        n_workers = min(self.ctx.jobs, len(tasks))
+        if n_workers < 2:
+            for task in tasks:
+                yield _create_thumbnails(task)
+        else:
+            with multiprocessing.Pool(n_workers) as pool:
+                yield from pool.imap(_create_thumbnails, tasks)
+
+    def remove_stale_files(self, *, deep: bool = False) -> None:
+        self.resources.remove_stale_files(self.ctx.output_root, deep=deep)
+
+
+_worker_generator: Optional[Generator] = None  # pylint: disable=invalid-name
+
+
+def _init_worker(generator: Generator) -> None:
+    global _worker_generator  # pylint: disable=global-statement
+    _worker_generator = generator
+
+
+def _process_page_in_worker(job: Tuple[str, str, bool]) -> PageResult:
+    assert _worker_generator
+    return _worker_generator.process_page(*job)
+
+
+def _create_thumbnails(job: Tuple[str, List[imaging.ThumbnailSpec]]) -> List[str]:
+    source, thumbnails = job
+    targets = [target for target, _width, _height in thumbnails]
+    try:
+        imaging.create_thumbnails(source, thumbnails)
+    except Exception as e:
+        raise ValueError(f'Failed to create thumbnails {", ".join(targets)} from "{source}": {e}') from e
+    return targets
@@ -1,21 +1,64 @@
 # Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
-from typing import Optional
+import math
+from typing import Optional, List, Tuple
 
 from PIL import Image
 from resizeimage import resizeimage
 
+ENCODER_VERSION = 2
+# The image is reduced to at least this multiple of the thumbnail size before it is resampled,
+# like Image.thumbnail(reducing_gap=2.0) does, so that the final resampling keeps the quality.
+REDUCING_GAP = 2
+# Palette, bilevel and 16-bit images are not supported by Image.reduce().
+REDUCE_MODES = ('L', 'LA', 'La', 'RGB', 'RGBA', 'RGBa', 'RGBX', 'CMYK', 'YCbCr', 'I', 'F')
+
+Size = Tuple[int, int]  # pylint: disable=invalid-name
+ThumbnailSpec = Tuple[str, Optional[int], Optional[int]]  # pylint: disable=invalid-name
+
 
 def create_thumbnail(input_file: str, output_file: str, width: Optional[int], height: Optional[int]) -> None:
+    create_thumbnails(input_file, [(output_file, width, height)])
+
+
+def create_thumbnails(input_file: str, thumbnails: List[ThumbnailSpec]) -> None:
     with open(input_file, 'rb') as fh:
-        img = Image.open(fh)
-        if width and height:
-            img = resizeimage.resize_thumbnail(img, [width, height])
-        elif width:
-            img = resizeimage.resize_width(img, width)
-        elif height:
-            img = resizeimage.resize_height(img, height)
-        else:
-            raise ValueError('Width or height must be specified.')
-        img.save(output_file)
+        original = Image.open(fh)
+        required_width, required_height = get_required_size(original.size, thumbnails)
+        required = required_width * REDUCING_GAP, required_height * REDUCING_GAP
+        if original.format == 'JPEG':
+            # The JPEG decoder can scale the image down in the DCT domain, which is much faster than a full decode.
+            original.draft(original.mode, required)
+        original.load()
+        factor = min(original.size[0] // required[0], original.size[1] // required[1])
+        if factor >= 2 and original.mode in REDUCE_MODES and hasattr(original, 'reduce'):
+            original = original.reduce(factor)
+        for output_file, width, height in thumbnails:
+            if width and height:
+                img = resizeimage.resize_thumbnail(original, [width, height])
+            elif width:
+                img = resizeimage.resize_width(original, width)
+            elif height:
+                img = resizeimage.resize_height(original, height)
+            else:
+                raise ValueError('Width or height must be specified.')
+            img.save(output_file)
+
+
+def get_thumbnail_size(size: Size, width: Optional[int], height: Optional[int]) -> Tuple[float, float]:
+    original_width, original_height = size
+    if width and height:
+        scale = min(1.0, width / original_width, height / original_height)
+        return original_width * scale, original_height * scale
+    if width:
+        return width, original_height * width / original_width
+    if height:
+        return original_width * height / original_height, height
+    raise ValueError('Width or height must be specified.')
+
+
+def get_required_size(size: Size, thumbnails: List[ThumbnailSpec]) -> Size:
+    sizes = [get_thumbnail_size(size, width, height) for _output_file, width, height in thumbnails]
+    return (max(1, math.ceil(max(item[0] for item in sizes))),
+            max(1, math.ceil(max(item[1] for item in sizes))))
@@ -3,6 +3,7 @@
 
 import os
 import sys
+import traceback
 from argparse import ArgumentParser
 from multiprocessing import Process
 from typing import List
@@ -10,8 +11,10 @@ from typing import List
 from fxwebgen.utils import SmartFormatter
 from fxwebgen.postprocessor import PostProcessor
 from fxwebgen.generator import Generator, FORCE_REBUILD_CHOICES, FORCE_PAGES, FORCE_TEMPLATE
+from fxwebgen.profiler import Profiler, DEFAULT_TOP, SUMMARY_FILE, TRACE_FILE
 from fxwebgen import config
 from fxwebgen.server import create_server
+from fxwebgen.watcher import create_watcher
 
 
 def main(argv: List[str]) -> int:
@@ -28,46 +31,93 @@ def main(argv: List[str]) -> int:
                         help='Start a HTTP server for the output directory. This option is not read from a '
                              'configuration file. Note that when "path_prefix" is specified, the website is exported '
                              'at the path prefix under the output directory.')
+    parser.add_argument('-w', '--watch', action='store_true',
+                        help='Watch source directories for changes and update the output automatically. With '
+                             '"--serve", it replaces the interactive prompt. This option is not read from a '
+                             'configuration file.')
     parser.add_argument('-f', '--force', nargs='+', choices=FORCE_REBUILD_CHOICES,
                         help='Select what component to regenerate even though they seem to be unmodified. '
                              'This option is not read from a configuration file.')
+    parser.add_argument('--deep-clean', action='store_true',
+                        help='Walk the whole output directory to remove files which have not been generated by '
+                             'fxwebgen, e.g. after manual changes. Otherwise, only the files generated by the previous '
+                             'build are considered. This option is not read from a configuration file.')
+    parser.add_argument('--profile', metavar='DIR',
+                        help=f'Measure the stages of each build and write a summary of the slowest pages and stages '
+                             f'("{SUMMARY_FILE}") and a timeline in the Chrome trace-event format ("{TRACE_FILE}") to '
+                             f'the given directory. This option is not read from a configuration file.')
+    parser.add_argument('--profile-top', metavar='N', type=int, default=DEFAULT_TOP,
+                        help=f'The number of the slowest pages and stages in the profile summary '
+                             f'(default: {DEFAULT_TOP}). This option is not read from a configuration file.')
     args = parser.parse_args(argv[1:])
     ctx = config.parse(args)
+    if args.profile:
+        ctx.profiler = Profiler(os.path.abspath(args.profile), args.profile_top)
     generator = Generator(ctx, post_processor=PostProcessor())
-    generator.build(force=args.force)
+    generator.build(force=args.force, deep_clean=args.deep_clean)
+    process = None
     if args.serve:
-        def serve() -> None:
-            os.chdir(ctx.output_root)
-            server = create_server()
-            server.serve_forever()
-        process = Process(target=serve)
+        process = Process(target=serve, args=(ctx.output_root,))
         process.daemon = True
         process.start()
-        try:
-            while True:
-                # noinspection SpellCheckingInspection
-                command = input('[R]egenerate [Q]uit | Force rebuild: [P]ages, [T]emplate: ').strip().upper()
-                if command == 'P':
-                    generator.build(force=[FORCE_PAGES])
-                elif command == 'T':
-                    generator.build(force=[FORCE_TEMPLATE])
-                elif command in ('R', ''):
-                    generator.build()
-                elif command == 'Q':
-                    break
-                elif command:
-                    print(f'Unknown command: "{command}".')
-        finally:
+    try:
+        if args.watch:
+            watch(generator)
+        elif args.serve:
+            prompt(generator)
+    finally:
+        if process:
             process.terminate()
     return 0
 
 
+def prompt(generator: Generator) -> None:
+    while True:
+        # noinspection SpellCheckingInspection
+        command = input('[R]egenerate [D]eep clean [Q]uit | Force rebuild: [P]ages, [T]emplate: ')
+        command = command.strip().upper()
+        if command == 'P':
+            generator.build(force=[FORCE_PAGES])
+        elif command == 'T':
+            generator.build(force=[FORCE_TEMPLATE])
+        elif command in ('R', ''):
+            generator.build()
+        elif command == 'D':
+            generator.build(deep_clean=True)
+        elif command == 'Q':
+            break
+        elif command:
+            print(f'Unknown command: "{command}".')
+
+
+def watch(generator: Generator) -> None:
+    watcher = create_watcher(generator.get_source_dirs())
+    print('Watching for changes. Press Ctrl+C to quit.')
+    try:
+        while True:
+            paths = watcher.wait()
+            # noinspection PyBroadException
+            try:
+                generator.update(paths)
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+def serve(root: str) -> None:
+    os.chdir(root)
+    server = create_server()
+    server.serve_forever()
+
+
 def run() -> None:
     # noinspection PyBroadException
     try:
         code = main(sys.argv)
     except Exception:  # pylint: disable=broad-except
-        import traceback
         print("Unexpected failure:", file=sys.stderr)
         traceback.print_exc()
         code = 2
@@ -26,11 +26,19 @@ def dedent(text: str, unindent: Optional[str] = None) -> str:
 
 
 class BootstrapExtension(Extension):
+    md: markdown.Markdown
+
     def extendMarkdown(self, md: markdown.Markdown) -> None:
+        self.md = md
         md.registerExtension(self)
         md.parser.blockprocessors.add('bootstrap', BootstrapProcessor(md), '_begin')
         md.preprocessors.add('bootstrap', BootstrapPreprocessor(md), '<html_block')
 
+    def reset(self) -> None:
+        stash = getattr(self.md, 'bootstrap_stash', None)
+        if stash is not None:
+            stash.reset()
+
 
 class BootstrapPreprocessor(Preprocessor):
     def run(self, lines: List[str]) -> List[str]:
@@ -18,11 +18,19 @@ PLACEHOLDER_RE = re.compile(PLACEHOLDER % r'([0-9]+)')
 
 
 class DivsExtension(Extension):
+    md: markdown.Markdown
+
     def extendMarkdown(self, md: markdown.Markdown) -> None:
+        self.md = md
         md.registerExtension(self)
         md.parser.blockprocessors.add('divs', DivsProcessor(md), '_begin')
         md.preprocessors.add('divs', DivsPreprocessor(md), '<html_block')
 
+    def reset(self) -> None:
+        stash = getattr(self.md, 'divs_stash', None)
+        if stash is not None:
+            stash.reset()
+
 
 class DivsPreprocessor(Preprocessor):
     def run(self, lines: List[str]) -> List[str]:
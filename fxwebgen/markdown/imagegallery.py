@@ -16,10 +16,17 @@ IMAGE_LINK_RE = r'\+\['
 
 
 class ImageGalleryExtension(Extension):
+    md: Markdown
+
     def extendMarkdown(self, md: Markdown) -> None:
+        self.md = md
+        md.registerExtension(self)
         md.parser.blockprocessors.add('gallery', ImageGalleryProcessor(md, md.parser), '>ulist')
         md.inlinePatterns.add('image_thumbnail_link', ImageLinkInlineProcessor(IMAGE_LINK_RE, md), '<link')
 
+    def reset(self) -> None:
+        setattr(self.md, 'thumbnails', {})
+
 
 class ImageGalleryProcessor(BlockProcessor):
     RE = re.compile(r'^[+ ][Gg]allery(?:\s+\d+cols)?((?:\s*\n\+\[.+\]\(.+\|.+\))+)\s*$')
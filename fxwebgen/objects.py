@@ -1,7 +1,10 @@
 # Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
-from typing import Optional
+from typing import Optional, Dict, List, Set
+
+from fxwebgen.profiler import Event
+from fxwebgen.typing import StrDict
 
 
 class Thumbnail:
@@ -32,3 +35,37 @@ class Thumbnail:
         return f'Thumbnail[{self.filename}]'
 
     __repr__ = __str__
+
+
+# pylint: disable=too-many-instance-attributes
+class PageResult:
+    source: str
+    target: str
+    metadata: StrDict
+    thumbnails: Dict[str, Thumbnail]
+    toc: Optional[str]
+    warnings: List[str]
+    dependencies: Set[str]
+    built: bool
+    unchanged: bool
+    events: List[Event]
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, source: str, target: str, metadata: StrDict, thumbnails: Dict[str, Thumbnail],
+                 toc: Optional[str], warnings: List[str], dependencies: Set[str], built: bool,
+                 unchanged: bool = False, events: Optional[List[Event]] = None) -> None:
+        self.source = source
+        self.target = target
+        self.metadata = metadata
+        self.thumbnails = thumbnails
+        self.toc = toc
+        self.warnings = warnings
+        self.dependencies = dependencies
+        self.built = built
+        self.unchanged = unchanged
+        self.events = events or []
+
+    def __str__(self) -> str:
+        return f'PageResult[{self.source}]'
+
+    __repr__ = __str__
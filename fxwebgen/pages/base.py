@@ -1,7 +1,9 @@
 # Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
-from typing import Optional, cast, Dict
+from typing import Optional, cast, Dict, List, Set, Any
+
+import xml.etree.ElementTree as etree
 
 from fxwebgen.context import Context
 from fxwebgen.objects import Thumbnail
@@ -18,7 +20,11 @@ class Page:
     metadata: StrDict
     references: dict
     thumbnails: Dict[str, Thumbnail]
+    warnings: List[str]
+    dependencies: Set[str]
     ctx: Context
+    tree: Optional[Any]
+    raw_html: List[str]
 
     @classmethod
     def test(cls, path: str) -> bool:
@@ -32,12 +38,28 @@ class Page:
         self.metadata = {}
         self.references = {}
         self.thumbnails = {}
+        self.warnings = []
+        self.dependencies = set()
         self.toc = None
         self.target = None
+        self.tree = None
+        self.raw_html = []
 
     def process(self) -> None:
         raise NotImplementedError
 
+    def serialize(self, strip: bool = True) -> None:
+        pass
+
+    def serialize_element(self, elm: Any) -> str:
+        return cast(str, etree.tostring(elm, encoding='unicode', method='html'))
+
+    def close(self) -> None:
+        pass
+
+    def warn(self, message: str) -> None:
+        self.warnings.append(f'Warning: {self.source}: {message}')
+
     @property
     def webroot(self) -> str:
         return cast(str, self.metadata['webroot'])
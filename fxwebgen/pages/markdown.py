@@ -3,7 +3,8 @@
 
 import os
 import re
-from typing import Any, List, Match, Optional, Tuple
+from typing import Any, List, Match, Optional, Tuple, Set, ClassVar, Dict
+from weakref import WeakKeyDictionary
 
 import markdown
 from markdown.preprocessors import Preprocessor
@@ -19,11 +20,134 @@ class MarkdownPage(Page):
     def test(cls, path: str) -> bool:
         return path.endswith(('.md', '.mkd'))
 
-    md: markdown.Markdown
+    converters: ClassVar['WeakKeyDictionary[Context, ConverterPool]'] = WeakKeyDictionary()
+    snippets: Optional['SnippetsPreprocessor']
+    md: Optional[markdown.Markdown]
 
     def __init__(self, ctx: Context, source: str, default_path: str) -> None:
         super().__init__(ctx, source, default_path[:-2] + 'html')
-        self.md = markdown.Markdown(
+        self.snippets = None
+        self.md = None
+
+    @classmethod
+    def get_converters(cls, ctx: Context) -> 'ConverterPool':
+        try:
+            return cls.converters[ctx]
+        except KeyError:
+            pool = cls.converters[ctx] = ConverterPool(ctx)
+            return pool
+
+    def process(self) -> None:
+        with open(self.source) as fh:
+            data = fh.read()
+        converters = self.get_converters(self.ctx)
+        md = converters.acquire()
+        try:
+            self.snippets = md.preprocessors['snippets']
+            self.tree = self._parse(md, data)
+            missing = md.preprocessors['variables'].missing
+            if missing:
+                self.warn(f'Undefined variables: {", ".join(sorted(missing))}.')
+            m = self.metadata
+            try:
+                for key, val in getattr(md, 'Meta').items():
+                    m[key] = " ".join(val)
+            except AttributeError:
+                pass
+            self.references = dict(md.references)
+            self.thumbnails.update(getattr(md, 'thumbnails', {}))
+            self.dependencies.update(self.snippets.files)
+        except BaseException:
+            converters.release(md)
+            raise
+        if self.tree is None:
+            converters.release(md)
+            self.body = ''
+        else:
+            # The converter is kept until the tree is serialized, because it holds the stash of raw HTML.
+            self.md = md
+            self.raw_html = [html if isinstance(html, str) else md.serializer(html)
+                             for html in md.htmlStash.rawHtmlBlocks]
+
+    @staticmethod
+    def _parse(md: markdown.Markdown, data: str) -> Optional[etree.Element]:
+        # The same as the first half of Markdown.convert(), the tree is serialized later by serialize().
+        if not data.strip():
+            return None
+        md.lines = data.split("\n")
+        for preprocessor in md.preprocessors:
+            md.lines = preprocessor.run(md.lines)
+        root = md.parser.parseDocument(md.lines).getroot()
+        for treeprocessor in md.treeprocessors:
+            new_root = treeprocessor.run(root)
+            if new_root is not None:
+                root = new_root
+        return root
+
+    def serialize(self, strip: bool = True) -> None:
+        if self.tree is None:
+            return
+        md = self.md
+        assert md
+        output = md.serializer(self.tree)
+        if md.stripTopLevelTags:
+            try:
+                start = output.index(f'<{md.doc_tag}>') + len(md.doc_tag) + 2
+                end = output.rindex(f'</{md.doc_tag}>')
+                output = output[start:end]
+            except ValueError:
+                assert output.strip().endswith(f'<{md.doc_tag} />'), f'Failed to strip top-level tags: {output!r}.'
+                output = ''
+        if strip:
+            output = output.strip()
+        for postprocessor in md.postprocessors:
+            output = postprocessor.run(output)
+        self.body = output.strip() if strip else output
+        self.tree = None
+        self.close()
+
+    def serialize_element(self, elm: etree.Element) -> str:
+        md = self.md
+        assert md
+        output = md.serializer(elm)
+        for postprocessor in md.postprocessors:
+            output = postprocessor.run(output)
+        return output.strip()
+
+    def close(self) -> None:
+        if self.md:
+            self.get_converters(self.ctx).release(self.md)
+            self.md = None
+            self.tree = None
+
+
+class ConverterPool:
+    ctx: Context
+    idle: List[markdown.Markdown]
+
+    def __init__(self, ctx: Context) -> None:
+        self.ctx = ctx
+        self.idle = []
+
+    def clear_cache(self) -> None:
+        # Variable paths are memoized for a single build only.
+        for md in self.idle:
+            md.preprocessors['variables'].resolved.clear()
+
+    def acquire(self) -> markdown.Markdown:
+        return self.idle.pop() if self.idle else self.create()
+
+    def release(self, md: markdown.Markdown) -> None:
+        md.reset()
+        # The abbr extension registers an inline pattern for each abbreviation of a document.
+        patterns = md.inlinePatterns
+        for name in [name for name in getattr(patterns, '_data') if name.startswith('abbr-')]:
+            patterns.deregister(name)
+        self.idle.append(md)
+
+    def create(self) -> markdown.Markdown:
+        ctx = self.ctx
+        md = markdown.Markdown(
             extensions=[
                 'meta',
                 'sane_lists',
@@ -45,23 +169,10 @@ class MarkdownPage(Page):
                 }
             },
             lazy_ol=False)
-        self.md.inlinePatterns.add('span_class', SpanWithClassPattern(SpanWithClassPattern.PATTERN), '_end')
-        self.md.preprocessors.add('variables', ExpandVariablesPreprocessor(self.md, ctx.global_vars), '_begin')
-        self.md.preprocessors.add('snippets', SnippetsPreprocessor(self.md, ctx.snippets_dir), '_begin')
-
-    def process(self) -> None:
-        with open(self.source) as fh:
-            data = fh.read()
-        md = self.md
-        self.body = md.convert(data)
-        m = self.metadata
-        try:
-            for key, val in getattr(md, 'Meta').items():
-                m[key] = " ".join(val)
-        except AttributeError:
-            pass
-        self.references = md.references
-        self.thumbnails.update(getattr(md, 'thumbnails', {}))
+        md.inlinePatterns.add('span_class', SpanWithClassPattern(SpanWithClassPattern.PATTERN), '_end')
+        md.preprocessors.add('variables', ExpandVariablesPreprocessor(md, ctx.global_vars), '_begin')
+        md.preprocessors.add('snippets', SnippetsPreprocessor(md, ctx.snippets_dir), '_begin')
+        return md
 
 
 class SpanWithClassPattern(markdown.inlinepatterns.InlineProcessor):
@@ -76,97 +187,145 @@ class SpanWithClassPattern(markdown.inlinepatterns.InlineProcessor):
 
 class ExpandVariablesPreprocessor(Preprocessor):
     PATTERN = re.compile(r"(\\?)\${(\w+(?:\.\w+)*)(?:\|(.*?))?}")
+    variables: dict
+    resolved: Dict[str, Any]
+    missing: Set[str]
 
     def __init__(self, md: markdown.Markdown, variables: dict) -> None:
         super().__init__(md)
         self.variables = variables
+        # The variables do not change during a build, so each path is resolved only once.
+        self.resolved = {}
+        self.missing = set()
 
     def run(self, lines: List[str]) -> List[str]:
+        self.missing.clear()
+        if not any('${' in line for line in lines):
+            return lines
+
         def expand_variable(m: Match) -> Any:
             escape = m.group(1)
             if escape:
                 return m.group(0)[1:]
             keys = m.group(2).strip()
             default = m.group(3)
-            value: Any = self.variables
-            for key in keys.split('.'):
-                key = key.strip()
-                try:
-                    value = value[key]
-                except (KeyError, TypeError) as e:
-                    print(e)
-                    try:
-                        value = getattr(value, key)
-                    except (AttributeError, TypeError) as e:
-                        print(e)
-                        value = None
-                        break
+            value = self.resolve(keys)
             if value is None:
-                value = '!!${ %s }' % keys if default is None else default
+                if default is not None:
+                    return default
+                self.missing.add(keys)
+                return '!!${ %s }' % keys
             return str(value)
 
         for i, line in enumerate(lines):
-            lines[i] = self.PATTERN.sub(expand_variable, line)
+            if '${' in line:
+                lines[i] = self.PATTERN.sub(expand_variable, line)
         return lines
 
+    def resolve(self, keys: str) -> Any:
+        try:
+            return self.resolved[keys]
+        except KeyError:
+            pass
+        value: Any = self.variables
+        for key in keys.split('.'):
+            key = key.strip()
+            try:
+                value = value[key]
+            except (KeyError, TypeError):
+                try:
+                    value = getattr(value, key)
+                except (AttributeError, TypeError):
+                    value = None
+                    break
+        self.resolved[keys] = value
+        return value
+
 
 class SnippetsPreprocessor(Preprocessor):
     PATTERN = re.compile(r"(\\?){\$\s*(\w+(?:[-./]\w+)*)\s*\$}")
+    # Snippet files are shared by all pages of the process and reloaded when they change.
+    cache: ClassVar[Dict[str, Tuple[int, int, str]]] = {}
     snippets_dir: Optional[str]
+    files: Set[str]
 
     def __init__(self, md: markdown.Markdown, snippets_dir: Optional[str] = None) -> None:
         super().__init__(md)
         self.snippets_dir = snippets_dir
+        self.files = set()
 
     def run(self, lines: List[str]) -> List[str]:
-        def load_snippet(filename: str) -> str:
-            filename = filename.strip().strip('/')
-            if not self.snippets_dir:
-                return f'`Error: Snippets dir not set, "{filename}" cannot be included.`'
-            path = os.path.join(self.snippets_dir, filename)
-            try:
-                with open(path) as fh:
-                    return fh.read()
-            except OSError as e:
-                return f'`{" ".join(str(e).splitlines())}`'
-
-        def expand_snippets(old_lines: List[str]) -> Tuple[List[str], bool]:
-            new_lines = []
-            expanded = False
-            for line in old_lines:
-                buffer: List[str] = []
-                pos: int = 0
-                indent: str = utils.get_indent(line)
-                while True:
-                    begin = line.find('{$', pos)
-                    if begin < 0:
-                        if buffer:
-                            buffer.append(line[pos:])
-                        break
-                    if begin and line[begin - 1] == '\\':
-                        buffer.append(line[pos:begin - 1])
-                        buffer.append('{$')
-                        pos = begin + 2
-                    else:
-                        buffer.append(line[pos:begin])
-                        pos = begin + 2
-                        end = line.find('$}', pos)
-                        if not end:
-                            buffer.append(line[begin:pos])
-                        else:
-                            expanded = True
-                            result = load_snippet(line[pos:end].strip()).strip('\n')
-                            if indent:
-                                result = '\n'.join((indent + s if i else s) for i, s in enumerate(result.splitlines()))
-                            buffer.append(result)
-                            pos = end + 2
-                if buffer:
-                    new_lines.extend(''.join(buffer).splitlines())
+        self.files.clear()
+        # Each snippet is expanded only once per document, however many times it is included.
+        expanded: Dict[str, List[str]] = {}
+        return self.expand_lines(lines, expanded, [])
+
+    def expand_lines(self, lines: List[str], expanded: Dict[str, List[str]], stack: List[str]) -> List[str]:
+        new_lines = []
+        for line in lines:
+            if '{$' not in line:
+                new_lines.append(line)
+                continue
+            buffer: List[str] = []
+            pos: int = 0
+            indent: str = utils.get_indent(line)
+            while True:
+                begin = line.find('{$', pos)
+                if begin < 0:
+                    buffer.append(line[pos:])
+                    break
+                if begin and line[begin - 1] == '\\':
+                    buffer.append(line[pos:begin - 1])
+                    buffer.append('{$')
+                    pos = begin + 2
                 else:
-                    new_lines.append(line)
-            return new_lines, expanded
+                    buffer.append(line[pos:begin])
+                    pos = begin + 2
+                    end = line.find('$}', pos)
+                    if end < 0:
+                        buffer.append(line[begin:pos])
+                    else:
+                        result = self.expand_snippet(line[pos:end].strip(), expanded, stack)
+                        if indent:
+                            result = [(indent + s if i else s) for i, s in enumerate(result)]
+                        buffer.append('\n'.join(result))
+                        pos = end + 2
+            new_lines.extend(''.join(buffer).splitlines())
+        return new_lines
 
-        not_done = True
-        while not_done:
-            lines, not_done = expand_snippets(lines)
-        return lines
+    def expand_snippet(self, filename: str, expanded: Dict[str, List[str]], stack: List[str]) -> List[str]:
+        filename = filename.strip().strip('/')
+        if not self.snippets_dir:
+            return [f'`Error: Snippets dir not set, "{filename}" cannot be included.`']
+        path = os.path.join(self.snippets_dir, filename)
+        try:
+            return expanded[path]
+        except KeyError:
+            pass
+        if path in stack:
+            return [f'`Error: Snippet "{filename}" includes itself.`']
+        self.files.add(path)
+        try:
+            content = self.load_snippet(path)
+        except OSError as e:
+            return [f'`{" ".join(str(e).splitlines())}`']
+        stack.append(path)
+        try:
+            result = expanded[path] = self.expand_lines(content.strip('\n').splitlines(), expanded, stack)
+        finally:
+            stack.pop()
+        return result
+
+    @classmethod
+    def load_snippet(cls, path: str) -> str:
+        stat = os.stat(path)
+        try:
+            mtime, size, content = cls.cache[path]
+            if mtime == stat.st_mtime_ns and size == stat.st_size:
+                return content
+        except KeyError:
+            pass
+        with open(path) as fh:
+            content = fh.read()
+        cls.cache[path] = stat.st_mtime_ns, stat.st_size, content
+        return content
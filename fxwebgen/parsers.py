@@ -0,0 +1,61 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import importlib.util
+from typing import List, Dict
+
+from bs4 import BeautifulSoup, Tag
+
+HTML_PARSER_AUTO = 'auto'
+HTML_PARSER_LXML = 'lxml'
+HTML_PARSER_PYTHON = 'html.parser'
+# html5lib is not supported: Unlike html.parser and lxml, it keeps whitespace-only strings as they are,
+# so the output would differ, and it is even slower than html.parser.
+HTML_PARSER_CHOICES: List[str] = [HTML_PARSER_AUTO, HTML_PARSER_LXML, HTML_PARSER_PYTHON]
+
+_resolved: Dict[str, str] = {}
+
+
+def get_html_parser(name: str) -> str:
+    try:
+        return _resolved[name]
+    except KeyError:
+        pass
+    parser = name
+    if name == HTML_PARSER_AUTO:
+        parser = HTML_PARSER_LXML if importlib.util.find_spec('lxml') else HTML_PARSER_PYTHON
+    elif name not in HTML_PARSER_CHOICES:
+        print(f'Warning: HTML parser "{name}" is not supported, falling back to "{HTML_PARSER_PYTHON}".')
+        parser = HTML_PARSER_PYTHON
+    elif name != HTML_PARSER_PYTHON and not importlib.util.find_spec(name):
+        print(f'Warning: HTML parser "{name}" is not installed, falling back to "{HTML_PARSER_PYTHON}".')
+        parser = HTML_PARSER_PYTHON
+    _resolved[name] = parser
+    return parser
+
+
+class HtmlFragment:
+    parser: str
+    tree: BeautifulSoup
+    root: Tag
+
+    def __init__(self, html: str, parser: str = HTML_PARSER_PYTHON) -> None:
+        self.parser = parser
+        if parser == HTML_PARSER_PYTHON:
+            self.tree = self.root = BeautifulSoup(html, parser)
+        elif html.lstrip().startswith('<body'):
+            # The body element of HTML pages is kept as a part of the fragment.
+            self.tree = BeautifulSoup(f'<html>{html}</html>', parser)
+            head = self.tree.head
+            if head is not None and not head.contents:
+                head.decompose()
+            assert self.tree.html
+            self.root = self.tree.html
+        else:
+            # Document parsers would wrap a bare fragment with html and body elements and move some elements to head.
+            self.tree = BeautifulSoup(f'<html><body>{html}</body></html>', parser)
+            assert self.tree.body
+            self.root = self.tree.body
+
+    def decode(self) -> str:
+        return self.tree.decode() if self.root is self.tree else self.root.decode_contents()
@@ -2,151 +2,539 @@
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
 import re
-from typing import Callable, List
+import time
+import xml.etree.ElementTree as etree
+from html import unescape
+from typing import Callable, List, Dict, Optional, Tuple, Any, Iterable, MutableMapping, Match, cast
 
-from bs4 import BeautifulSoup, Tag
+from bs4 import Tag
 
 from fxwebgen.context import Context
 from fxwebgen.markdown import imagegallery
 from fxwebgen.pages import Page
+from fxwebgen.parsers import HtmlFragment, get_html_parser
+from fxwebgen.profiler import CATEGORY_HANDLER
+
+# Handlers receive either a BeautifulSoup tag or a Markdown ElementTree element.
+ElementHandler = Callable[[Context, Page, Any], None]  # pylint: disable=invalid-name
+Matches = Dict[str, List[Any]]  # pylint: disable=invalid-name
+Finalizer = Callable[[Context, Page, Any, Matches], None]  # pylint: disable=invalid-name
+Attributes = MutableMapping[str, Any]  # pylint: disable=invalid-name
+
+# Raw HTML is not a part of the Markdown ElementTree, so it must not contain anything the handlers modify.
+RAW_HTML_RE = re.compile(
+    r'<(?:h[1-5]|img)\b|\b(?:href|src)\s*=|\bclass\s*=\s*["\']?[^"\'>]*\b(?:toc|admonition)\b', re.IGNORECASE)
+# The output of the ElementTree path is normalized to match the output of BeautifulSoup with html.parser or lxml:
+# Character references are replaced with characters, only "&", "<" and ">" are escaped, whitespace-only strings
+# are collapsed, void elements are closed without a space and whitespace-separated attributes are joined
+# with single spaces. Anything else, e.g. a script or a stray "<", is left to BeautifulSoup.
+HTML_TOKEN_RE = re.compile(
+    r'<!--.*?-->|</([a-zA-Z][-a-zA-Z0-9]*)\s*>|<([a-zA-Z][-a-zA-Z0-9]*)((?:\s+[^\s"\'<>/=]+="[^"]*")*)\s*(/?)>',
+    re.DOTALL)
+HTML_ATTRIBUTE_RE = re.compile(r'([^\s"\'<>/=]+)="([^"]*)"')
+ASCII_SPACES = ' \n\t\x0c\r'
+# Separates strings joined by the removal of an element, BeautifulSoup keeps them as separate nodes.
+STRING_SEPARATOR = '\x00'
+PRESERVE_WHITESPACE_ELEMENTS = frozenset(('pre', 'textarea'))
+RAW_TEXT_ELEMENTS = frozenset(('script', 'style'))
+VOID_ELEMENTS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem', 'meta', 'param',
+    'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex', 'nextid', 'spacer'))
+MULTI_VALUED_ATTRIBUTES: Dict[str, Tuple[str, ...]] = {
+    '*': ('class', 'accesskey', 'dropzone'),
+    'a': ('rel', 'rev'),
+    'link': ('rel', 'rev'),
+    'td': ('headers',),
+    'th': ('headers',),
+    'form': ('accept-charset',),
+    'object': ('archive',),
+    'area': ('rel',),
+    'icon': ('sizes',),
+    'iframe': ('sandbox',),
+    'output': ('for',),
+}
+
+
+class Handler:
+    names: Optional[Tuple[str, ...]]
+    attributes: Optional[Tuple[str, ...]]
+    css_class: Optional[str]
+    func: Optional[ElementHandler]
+    key: Optional[str]
+
+    def __init__(self, func: Optional[ElementHandler], names: Optional[Tuple[str, ...]] = None,
+                 attributes: Optional[Tuple[str, ...]] = None, css_class: Optional[str] = None,
+                 key: Optional[str] = None) -> None:
+        self.func = func
+        self.names = names
+        self.attributes = attributes
+        self.css_class = css_class
+        self.key = key
+
+    def matches(self, attributes: Attributes) -> bool:
+        if self.attributes and not any(attribute in attributes for attribute in self.attributes):
+            return False
+        if not self.css_class:
+            return True
+        classes = attributes.get('class') or ()
+        return self.css_class in (classes.split() if isinstance(classes, str) else classes)
+
+
+class Dispatcher:
+    handlers: List[Handler]
+    finalizers: List[Finalizer]
+    handlers_by_name: Dict[str, List[Handler]]
 
+    def __init__(self) -> None:
+        self.handlers = []
+        self.finalizers = []
+        self.handlers_by_name = {}
+
+    def add_handler(self, func: ElementHandler, names: Optional[Tuple[str, ...]] = None,
+                    attributes: Optional[Tuple[str, ...]] = None, css_class: Optional[str] = None) -> None:
+        self.handlers.append(Handler(func, names, attributes, css_class))
+        self.handlers_by_name.clear()
+
+    def add_collector(self, key: str, names: Optional[Tuple[str, ...]] = None,
+                      attributes: Optional[Tuple[str, ...]] = None, css_class: Optional[str] = None) -> None:
+        self.handlers.append(Handler(None, names, attributes, css_class, key))
+        self.handlers_by_name.clear()
+
+    def add_finalizer(self, func: Finalizer) -> None:
+        self.finalizers.append(func)
+
+    def get_handlers(self, name: str) -> List[Handler]:
+        try:
+            return self.handlers_by_name[name]
+        except KeyError:
+            handlers = self.handlers_by_name[name] = [
+                handler for handler in self.handlers if not handler.names or name in handler.names]
+            return handlers
+
+    def dispatch(self, ctx: Context, page: Page, root: Any, elements: Iterable[Tuple[str, Attributes, Any]]) -> None:
+        profiler = ctx.profiler
+        timings: Optional[Dict[ElementHandler, float]] = {} if profiler.enabled else None
+        start = time.perf_counter()
+        matches: Matches = {}
+        # Handlers are selected by the element name before any of them is applied, so renaming an element
+        # does not make it match other handlers.
+        for name, attributes, elm in elements:
+            for handler in self.get_handlers(name):
+                if handler.matches(attributes):
+                    if handler.func:
+                        if timings is None:
+                            handler.func(ctx, page, elm)
+                        else:
+                            self._call_timed(timings, handler.func, ctx, page, elm)
+                    else:
+                        assert handler.key
+                        matches.setdefault(handler.key, []).append(elm)
+        if timings:
+            # Handlers are applied to many elements of a page, so only their total time per page is recorded.
+            for handler_func, duration in timings.items():
+                profiler.add(handler_func.__name__, CATEGORY_HANDLER, start, duration, page.source)
+        for finalizer in self.finalizers:
+            with profiler.measure(finalizer.__name__, CATEGORY_HANDLER, page.source):
+                finalizer(ctx, page, root, matches)
+
+    @staticmethod
+    def _call_timed(timings: Dict[ElementHandler, float], func: ElementHandler, ctx: Context, page: Page,
+                    elm: Any) -> None:
+        start = time.perf_counter()
+        try:
+            func(ctx, page, elm)
+        finally:
+            timings[func] = timings.get(func, 0.0) + time.perf_counter() - start
 
-class PostProcessor:
-    post_processors: List[Callable[[Context, Page, BeautifulSoup], None]]
 
-    def __init__(self) -> None:
-        self.post_processors = [
-            resize_images,
-            replace_absolute_links,
-            replace_pelican_links,
-            replace_interlinks,
-            extract_toc,
-            downgrade_headings,
-            add_title_as_heading,
-            bootstrap_admonition,
-        ]
+class PostProcessor:
+    html: Dispatcher
+    etree: Dispatcher
+    use_etree: bool
+
+    def __init__(self, use_etree: bool = True) -> None:
+        # The ElementTree of Markdown pages is processed directly unless disabled, e.g. to compare the output.
+        self.use_etree = use_etree
+        # Handlers are applied to each element in the order of registration and finalizers run after the tree walk.
+        self.html = html = Dispatcher()
+        html.add_handler(resize_images, ('img',), ('src',))
+        html.add_handler(replace_absolute_links, attributes=('href', 'src'))
+        html.add_handler(replace_pelican_links, attributes=('href',))
+        html.add_handler(replace_interlinks, attributes=('href', 'src'))
+        html.add_collector('toc', ('div',), css_class='toc')
+        html.add_handler(downgrade_headings, ('h1', 'h2', 'h3', 'h4', 'h5'))
+        html.add_collector('h1', ('h1',))
+        html.add_collector('admonition', ('div',), css_class=ADMONITION_CLASS)
+        html.add_finalizer(extract_toc)
+        html.add_finalizer(add_title_as_heading)
+        html.add_finalizer(bootstrap_admonition)
+
+        # The same for the ElementTree of Markdown pages.
+        self.etree = tree = Dispatcher()
+        tree.add_handler(resize_images, ('img',), ('src',))
+        tree.add_handler(replace_absolute_links, attributes=('href', 'src'))
+        tree.add_handler(replace_pelican_links, attributes=('href',))
+        tree.add_handler(replace_interlinks, attributes=('href', 'src'))
+        tree.add_collector('toc', ('div',), css_class='toc')
+        tree.add_handler(downgrade_headings_in_etree, ('h1', 'h2', 'h3', 'h4', 'h5'))
+        tree.add_collector('h1', ('h1',))
+        tree.add_collector('admonition', ('div',), css_class=ADMONITION_CLASS)
+        tree.add_finalizer(extract_toc_from_etree)
+        tree.add_finalizer(add_title_as_heading_to_etree)
+        tree.add_finalizer(bootstrap_admonition_in_etree)
 
     def process_page(self, ctx: Context, page: Page) -> None:
-        body = page.body or ''
-        tree = BeautifulSoup(body, 'html.parser')
-        for func in self.post_processors:
-            func(ctx, page, tree)
-        page.body = tree.decode()
+        root = page.tree
+        if self.use_etree and root is not None and not any(RAW_HTML_RE.search(html) for html in page.raw_html) \
+                and normalize_html(''.join(page.raw_html)) is not None:
+            # Markdown pages are processed before serialization to avoid parsing the HTML output again.
+            edges = strip_edges(root)
+            elements = [elm for elm in root.iter() if elm is not root and isinstance(elm.tag, str)]
+            self.etree.dispatch(ctx, page, root, ((elm.tag, normalize_attributes(elm), elm) for elm in elements))
+            page.serialize(strip=False)
+            body = self.normalize(ctx, page.body or '')
+            # BeautifulSoup gets a stripped body, so the whitespace exposed by removed elements is kept.
+            first, last = get_edges(root)
+            if first is edges[0]:
+                body = body.lstrip()
+            if last is edges[1]:
+                body = body.rstrip()
+            page.body = body
+            if page.toc:
+                page.toc = self.normalize(ctx, page.toc)
+            return
+
+        page.serialize()
+        fragment = HtmlFragment(page.body or '', get_html_parser(ctx.html_parser))
+        root = fragment.root
+        self.html.dispatch(ctx, page, root, (
+            (elm.name, elm.attrs, elm) for elm in [node for node in root.descendants if isinstance(node, Tag)]))
+        page.body = fragment.decode()
+
+    @staticmethod
+    def normalize(ctx: Context, html: str) -> str:
+        normalized = normalize_html(html)
+        if normalized is None:
+            # Not expected, the raw HTML has been checked, but BeautifulSoup normalizes anything.
+            return HtmlFragment(html.replace(STRING_SEPARATOR, ''), get_html_parser(ctx.html_parser)).decode()
+        return normalized
+
+
+def normalize_attributes(elm: etree.Element) -> Attributes:
+    attributes = elm.attrib
+    for names in MULTI_VALUED_ATTRIBUTES['*'], MULTI_VALUED_ATTRIBUTES.get(elm.tag, ()):
+        for name in names:
+            value = attributes.get(name)
+            if value is not None:
+                attributes[name] = ' '.join(value.split())
+    return attributes
+
+
+def get_edges(root: etree.Element) -> Tuple[Optional[etree.Element], Optional[etree.Element]]:
+    return (root[0], root[-1]) if len(root) > 0 else (None, None)
+
+
+def strip_edges(root: etree.Element) -> Tuple[Optional[etree.Element], Optional[etree.Element]]:
+    # The same whitespace as stripped from the serialized body before it is parsed by BeautifulSoup.
+    if len(root) == 0:
+        root.text = root.text.strip() if root.text else None
+    else:
+        if root.text:
+            root.text = root.text.lstrip()
+        last = root[-1]
+        if last.tail:
+            last.tail = last.tail.rstrip()
+    return get_edges(root)
+
+
+def normalize_html(html: str) -> Optional[str]:
+    # Returns None if the HTML is not simple enough to be normalized without a parser.
+    output: List[str] = []
+    stack: List[str] = []
+    pos = 0
+    for match in HTML_TOKEN_RE.finditer(html):
+        start = match.start()
+        if start > pos:
+            text = normalize_text(html[pos:start], not PRESERVE_WHITESPACE_ELEMENTS.isdisjoint(stack))
+            if text is None:
+                return None
+            output.append(text)
+        pos = match.end()
+        tag = normalize_tag(match, stack)
+        if tag is None:
+            return None
+        output.append(tag)
+    if pos < len(html):
+        text = normalize_text(html[pos:], not PRESERVE_WHITESPACE_ELEMENTS.isdisjoint(stack))
+        if text is None:
+            return None
+        output.append(text)
+    return None if stack else ''.join(output)
+
+
+def normalize_tag(match: Match, stack: List[str]) -> Optional[str]:
+    end_name, name, attributes, empty = match.groups()
+    if end_name:
+        end_name = end_name.lower()
+        return f'</{end_name}>' if stack and stack.pop() == end_name else None
+    if name is None:
+        return cast(str, match.group(0))
+    name = name.lower()
+    if name in RAW_TEXT_ELEMENTS:
+        return None
+    if attributes:
+        attributes = normalize_html_attributes(name, attributes)
+    if name in VOID_ELEMENTS:
+        return f'<{name}{attributes}/>'
+    if empty:
+        return None
+    stack.append(name)
+    return f'<{name}{attributes}>'
+
+
+def normalize_text(text: str, preserve_whitespace: bool) -> Optional[str]:
+    if STRING_SEPARATOR in text:
+        strings = [normalize_text(string, preserve_whitespace) for string in text.split(STRING_SEPARATOR) if string]
+        return None if None in strings else ''.join(cast(List[str], strings))
+    if '<' in text:
+        return None
+    if '&' in text:
+        text = unescape(text)
+    if not preserve_whitespace and not text.strip(ASCII_SPACES):
+        return '\n' if '\n' in text else ' '
+    return escape_html(text)
+
+
+def normalize_html_attributes(name: str, attributes: str) -> str:
+    multi_valued = MULTI_VALUED_ATTRIBUTES['*'] + MULTI_VALUED_ATTRIBUTES.get(name, ())
+    output = []
+    for key, value in HTML_ATTRIBUTE_RE.findall(attributes):
+        key = key.lower()
+        if '&' in value:
+            value = unescape(value)
+        if key in multi_valued:
+            value = ' '.join(value.split())
+        value = escape_html(value)
+        if '"' not in value:
+            output.append(f' {key}="{value}"')
+        elif "'" not in value:
+            output.append(f" {key}='{value}'")
+        else:
+            value = value.replace('"', '&quot;')
+            output.append(f' {key}="{value}"')
+    return ''.join(output)
+
+
+def escape_html(text: str) -> str:
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+def get_attributes(elm: Any) -> Attributes:
+    return elm.attrs if isinstance(elm, Tag) else elm.attrib
 
 
 ABSOLUTE_LINK_RE = re.compile("^:.+")
 
 
-def replace_absolute_links(_ctx: Context, page: Page, tree: BeautifulSoup) -> None:
+def replace_absolute_links(_ctx: Context, page: Page, elm: Any) -> None:
+    attributes = get_attributes(elm)
     for attribute in 'href', 'src':
-        for elm in tree.find_all(attrs={attribute: ABSOLUTE_LINK_RE}):
-            elm[attribute] = page.webroot + "/" + elm.get(attribute)[1:].lstrip('/')
+        url = attributes.get(attribute)
+        if url and ABSOLUTE_LINK_RE.search(url):
+            attributes[attribute] = page.webroot + "/" + url[1:].lstrip('/')
 
 
 PELICAN_LINK_RE = re.compile(r"{filename}(\.?)(.+)\.md(.*)")
 
 
-def replace_pelican_links(_ctx: Context, page: Page, tree: BeautifulSoup) -> None:
-    for link in tree.find_all(href=PELICAN_LINK_RE):
-        url = link.get('href')
-        print(f'Warning: {page.source}: Pelican links are deprecated: "{url}".')
-        match = PELICAN_LINK_RE.search(url)
-        assert match
+def replace_pelican_links(_ctx: Context, page: Page, elm: Any) -> None:
+    attributes = get_attributes(elm)
+    url = attributes.get('href')
+    match = PELICAN_LINK_RE.search(url) if url else None
+    if match:
+        page.warn(f'Pelican links are deprecated: "{url}".')
         dot = match.group(1)
         filename = match.group(2)
         rest = match.group(3)
         if dot:
-            link['href'] = dot + filename + ".html" + rest
+            attributes['href'] = dot + filename + ".html" + rest
         else:
-            link['href'] = page.webroot + "/" + filename + ".html" + rest
+            attributes['href'] = page.webroot + "/" + filename + ".html" + rest
 
 
 INTERLINK_RE = re.compile("(.+?)>")
 
 
-def replace_interlinks(ctx: Context, page: Page, tree: BeautifulSoup) -> None:
-    ctx.interlinks["this"] = page.webroot + "/"
+def replace_interlinks(ctx: Context, page: Page, elm: Any) -> None:
+    attributes = get_attributes(elm)
     for attribute in 'href', 'src':
-        for elm in tree.find_all(attrs={attribute: INTERLINK_RE}):
-            url = elm.get(attribute)
+        url = attributes.get(attribute) or ''
+        m = INTERLINK_RE.search(url)
+        if m:
             print(f'Interlink: {url}')
-            m = INTERLINK_RE.search(url)
-            assert m
+            ctx.interlinks["this"] = page.webroot + "/"
             name = m.group(1)
-            elm[attribute] = ctx.interlinks[name] + url[len(name) + 1:]
+            attributes[attribute] = ctx.interlinks[name] + url[len(name) + 1:]
 
 
-def extract_toc(_ctx: Context, page: Page, tree: BeautifulSoup) -> None:
-    toc = tree.find('div', class_='toc')
+def extract_toc(_ctx: Context, page: Page, _tree: Tag, matches: Matches) -> None:
+    toc = matches.get('toc')
     if toc:
-        toc.extract()
-        page.toc = toc.decode()
+        toc[0].extract()
+        page.toc = toc[0].decode()
     else:
         page.toc = None
 
 
-def downgrade_headings(ctx: Context, _page: Page, tree: BeautifulSoup) -> None:
+def extract_toc_from_etree(_ctx: Context, page: Page, tree: etree.Element, matches: Matches) -> None:
+    toc = matches.get('toc')
+    if toc:
+        remove_element(tree, toc[0])
+        page.toc = page.serialize_element(toc[0])
+    else:
+        page.toc = None
+
+
+def downgrade_headings(ctx: Context, _page: Page, elm: Tag) -> None:
+    if ctx.downgrade_headings:
+        elm.name = f'h{int(elm.name[1]) + 1}'
+
+
+def downgrade_headings_in_etree(ctx: Context, _page: Page, elm: etree.Element) -> None:
     if ctx.downgrade_headings:
-        for i in range(5, 0, -1):
-            downgraded = f'h{i + 1}'
-            for elm in tree.find_all(f'h{i}'):
-                elm.name = downgraded
+        elm.tag = f'h{int(elm.tag[1]) + 1}'
 
 
-def add_title_as_heading(ctx: Context, page: Page, tree: BeautifulSoup) -> None:
-    if ctx.title_as_heading and tree.find('h1') is None:
+def add_title_as_heading(ctx: Context, page: Page, tree: Tag, matches: Matches) -> None:
+    if ctx.title_as_heading and not any(elm.name == 'h1' for elm in matches.get('h1', ())):
         heading = Tag(name='h1')
         heading.string = page.metadata['title']
         tree.insert(0, heading)
 
 
+def add_title_as_heading_to_etree(ctx: Context, page: Page, tree: etree.Element, matches: Matches) -> None:
+    if ctx.title_as_heading and not any(elm.tag == 'h1' for elm in matches.get('h1', ())):
+        heading = etree.Element('h1')
+        heading.text = page.metadata['title']
+        # The heading must precede the text before the first element.
+        heading.tail = tree.text
+        tree.text = None
+        tree.insert(0, heading)
+
+
 ADMONITION_CLASS = 'admonition'
 ADMONITION_TITLE_CLASS = 'admonition-title'
 
 
-def bootstrap_admonition(_ctx: Context, _page: Page, tree: BeautifulSoup) -> None:
-    panels = tree.find_all('div', class_=ADMONITION_CLASS)
-    if panels:
-        for panel in panels:
-            classes = panel["class"]
-            index = classes.index(ADMONITION_CLASS)
-            classes[index] = 'card'
-            kind = classes[index + 1]
-            classes[index + 1] = "border-{}".format(kind)
-            classes.append('border')
-            classes.append('mb-3')
-
-            title = panel.find("p", class_=ADMONITION_TITLE_CLASS)
-            panel_contents = panel.contents[:]
-            panel.clear()
-
-            if title:
-                classes = title["class"]
-                try:
-                    index = classes.index(ADMONITION_TITLE_CLASS)
-                    classes[index] = 'card-header'
-                except ValueError as e:
-                    print(e)
-                classes.append('bg-' + kind)
-                classes.append('text-dark' if kind == 'light' else 'text-light')
-
-                index = panel_contents.index(title)
-                panel_contents = panel_contents[index + 1:]
-                panel.append(title)
-
-            body = Tag(name="div")
-            body["class"] = ["card-body"]
-            panel.append(body)
-
-            for i in panel_contents:
-                body.append(i)
-
-
-def resize_images(_ctx: Context, page: Page, tree: BeautifulSoup) -> None:
-    for elm in tree.find_all('img'):
-        thumbnail = imagegallery.parse_img_src_as_thumbnail(elm['src'])
-        if thumbnail:
-            page.thumbnails[thumbnail.filename] = thumbnail
-            elm['src'] = ":" + thumbnail.filename
-            if thumbnail.style:
-                elm['style'] = thumbnail.style.strip()
+def bootstrap_admonition(_ctx: Context, _page: Page, _tree: Tag, matches: Matches) -> None:
+    for panel in matches.get('admonition', ()):
+        classes = panel["class"]
+        index = classes.index(ADMONITION_CLASS)
+        classes[index] = 'card'
+        kind = classes[index + 1]
+        classes[index + 1] = "border-{}".format(kind)
+        classes.append('border')
+        classes.append('mb-3')
+
+        title = panel.find("p", class_=ADMONITION_TITLE_CLASS)
+        panel_contents = panel.contents[:]
+        panel.clear()
+
+        if title:
+            classes = title["class"]
+            try:
+                index = classes.index(ADMONITION_TITLE_CLASS)
+                classes[index] = 'card-header'
+            except ValueError as e:
+                print(e)
+            classes.append('bg-' + kind)
+            classes.append('text-dark' if kind == 'light' else 'text-light')
+
+            index = panel_contents.index(title)
+            panel_contents = panel_contents[index + 1:]
+            panel.append(title)
+
+        body = Tag(name="div")
+        body["class"] = ["card-body"]
+        panel.append(body)
+
+        for i in panel_contents:
+            body.append(i)
+
+
+def bootstrap_admonition_in_etree(_ctx: Context, _page: Page, _tree: etree.Element, matches: Matches) -> None:
+    for panel in matches.get('admonition', ()):
+        classes = panel.attrib['class'].split()
+        index = classes.index(ADMONITION_CLASS)
+        classes[index] = 'card'
+        kind = classes[index + 1]
+        classes[index + 1] = f'border-{kind}'
+        classes.append('border')
+        classes.append('mb-3')
+        panel.set('class', ' '.join(classes))
+
+        title = None
+        for elm in panel.iter('p'):
+            if ADMONITION_TITLE_CLASS in (elm.get('class') or '').split():
+                title = elm
+                break
+        panel_contents = list(panel)
+        text = panel.text
+        for elm in panel_contents:
+            panel.remove(elm)
+        panel.text = None
+
+        body = etree.Element('div', {'class': 'card-body'})
+        if title is not None:
+            classes = title.attrib['class'].split()
+            classes[classes.index(ADMONITION_TITLE_CLASS)] = 'card-header'
+            classes.append('bg-' + kind)
+            classes.append('text-dark' if kind == 'light' else 'text-light')
+            title.set('class', ' '.join(classes))
+
+            index = panel_contents.index(title)
+            panel_contents = panel_contents[index + 1:]
+            text = title.tail
+            title.tail = None
+            panel.append(title)
+
+        body.text = text
+        panel.append(body)
+        for elm in panel_contents:
+            body.append(elm)
+
+
+def remove_element(tree: etree.Element, elm: etree.Element) -> None:
+    for parent in tree.iter():
+        for index, child in enumerate(parent):
+            if child is elm:
+                # ElementTree keeps the text following an element as its tail.
+                if elm.tail:
+                    if index:
+                        previous = parent[index - 1]
+                        previous.tail = join_strings(previous.tail, elm.tail)
+                    else:
+                        parent.text = join_strings(parent.text, elm.tail)
+                    elm.tail = None
+                parent.remove(elm)
+                return
+
+
+def join_strings(first: Optional[str], second: str) -> str:
+    return first + STRING_SEPARATOR + second if first else second
+
+
+def resize_images(_ctx: Context, page: Page, elm: Any) -> None:
+    attributes = get_attributes(elm)
+    thumbnail = imagegallery.parse_img_src_as_thumbnail(attributes['src'])
+    if thumbnail:
+        page.thumbnails[thumbnail.filename] = thumbnail
+        attributes['src'] = ":" + thumbnail.filename
+        if thumbnail.style:
+            attributes['style'] = thumbnail.style.strip()
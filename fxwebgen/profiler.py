@@ -0,0 +1,122 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Tuple, Optional, Iterator, Dict, Any
+
+CATEGORY_STAGE = 'stage'
+CATEGORY_PAGE = 'page'
+CATEGORY_HANDLER = 'handler'
+DEFAULT_TOP = 20
+SUMMARY_FILE = 'profile.json'
+TRACE_FILE = 'trace.json'
+
+# name, category, pid, thread id, start, duration and page source
+Event = Tuple[str, str, int, int, float, float, Optional[str]]  # pylint: disable=invalid-name
+
+
+class Profiler:
+    output_dir: Optional[str]
+    top: int
+    events: List[Event]
+
+    def __init__(self, output_dir: Optional[str] = None, top: int = DEFAULT_TOP) -> None:
+        self.output_dir = output_dir
+        self.top = max(1, top)
+        self.events = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.output_dir is not None
+
+    @contextmanager
+    def measure(self, name: str, category: str = CATEGORY_STAGE, page: Optional[str] = None) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, time.perf_counter() - start, page)
+
+    def add(self, name: str, category: str, start: float, duration: float, page: Optional[str] = None) -> None:
+        # Appending to a list is atomic, so the events of threads need no lock.
+        self.events.append((name, category, os.getpid(), threading.get_ident(), start, duration, page))
+
+    def mark(self) -> int:
+        return len(self.events)
+
+    def take(self, mark: int) -> List[Event]:
+        # Events of pages built by worker processes are passed to the main process with the page results.
+        events = self.events[mark:]
+        del self.events[mark:]
+        return events
+
+    def extend(self, events: List[Event]) -> None:
+        self.events.extend(events)
+
+    def clear(self) -> None:
+        self.events.clear()
+
+    def get_summary(self) -> Dict[str, Any]:
+        stages: Dict[Tuple[str, str], List[float]] = {}
+        pages: List[Dict[str, Any]] = []
+        for name, category, _pid, _tid, _start, duration, page in self.events:
+            if category == CATEGORY_PAGE:
+                pages.append({'source': page, 'seconds': duration})
+            else:
+                stats = stages.setdefault((name, category), [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += duration
+                stats[2] = max(stats[2], duration)
+        pages.sort(key=_get_seconds, reverse=True)
+        stage_list: List[Dict[str, Any]] = [
+            {'name': name, 'category': category, 'count': int(count), 'seconds': total, 'max_seconds': longest}
+            for (name, category), (count, total, longest) in stages.items()]
+        stage_list.sort(key=_get_seconds, reverse=True)
+        return {
+            'pages': len(pages),
+            'pages_seconds': sum(item['seconds'] for item in pages),
+            'slowest_pages': pages[:self.top],
+            'slowest_stages': stage_list[:self.top],
+        }
+
+    def get_trace(self) -> Dict[str, Any]:
+        # Handlers of the post-processor are aggregated per page, so they have no place on the timeline.
+        events = [event for event in self.events if event[1] != CATEGORY_HANDLER]
+        origin = min((event[4] for event in events), default=0.0)
+        main_pid = os.getpid()
+        trace: List[Dict[str, Any]] = []
+        lanes: Dict[int, str] = {main_pid: 'fxwebgen'}
+        for name, category, pid, tid, start, duration, page in events:
+            if pid not in lanes:
+                lanes[pid] = f'worker {len(lanes)}'
+            item = {'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                    'ts': (start - origin) * 1e6, 'dur': duration * 1e6}
+            if page:
+                item['args'] = {'page': page}
+            trace.append(item)
+        for pid, lane in lanes.items():
+            trace.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': lane}})
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def save(self) -> None:
+        assert self.output_dir
+        os.makedirs(self.output_dir, exist_ok=True)
+        summary_path = os.path.join(self.output_dir, SUMMARY_FILE)
+        trace_path = os.path.join(self.output_dir, TRACE_FILE)
+        with open(summary_path, 'wt', encoding='utf-8') as fh:
+            json.dump(self.get_summary(), fh, indent=2)
+        with open(trace_path, 'wt', encoding='utf-8') as fh:
+            json.dump(self.get_trace(), fh)
+        print(f'Profile: "{summary_path}", trace: "{trace_path}"')
+
+
+def _get_seconds(item: Dict[str, Any]) -> float:
+    seconds: float = item['seconds']
+    return seconds
@@ -0,0 +1,172 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import errno
+import os
+import shutil
+import threading
+from typing import Dict, List, Tuple, Callable, Set, Optional
+
+from fxwebgen.fingerprints import Fingerprints
+
+PUBLISH_AUTO = 'auto'
+PUBLISH_COPY = 'copy'
+PUBLISH_HARDLINK = 'hardlink'
+PUBLISH_REFLINK = 'reflink'
+PUBLISH_COPY_FILE_RANGE = 'copy_file_range'
+PUBLISH_CHOICES: List[str] = [PUBLISH_AUTO, PUBLISH_COPY, PUBLISH_HARDLINK, PUBLISH_REFLINK, PUBLISH_COPY_FILE_RANGE]
+# Each strategy falls back to the next one when it is not supported by the file system.
+FALLBACKS: Dict[str, List[str]] = {
+    PUBLISH_AUTO: [PUBLISH_REFLINK, PUBLISH_COPY_FILE_RANGE, PUBLISH_COPY],
+    PUBLISH_COPY: [PUBLISH_COPY],
+    PUBLISH_HARDLINK: [PUBLISH_HARDLINK, PUBLISH_REFLINK, PUBLISH_COPY_FILE_RANGE, PUBLISH_COPY],
+    PUBLISH_REFLINK: [PUBLISH_REFLINK, PUBLISH_COPY_FILE_RANGE, PUBLISH_COPY],
+    PUBLISH_COPY_FILE_RANGE: [PUBLISH_COPY_FILE_RANGE, PUBLISH_COPY],
+}
+# A method that is not supported by a file system is not tried again for other files on the same device.
+UNSUPPORTED_ERRORS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOSYS, errno.ENOTTY}
+# Other failures, e.g. too many links to a file, fall back to the next method only for the given file.
+FALLBACK_ERRORS = UNSUPPORTED_ERRORS | {errno.EINVAL, errno.EPERM, errno.EMLINK, errno.EBADF}
+FICLONE = 0x40049409
+DEDUPLICATED = 'deduplicated'
+UNCHANGED = 'unchanged'
+
+
+def hardlink(source: str, target: str) -> None:
+    os.link(source, target)
+
+
+def reflink(source: str, target: str) -> None:
+    import fcntl  # pylint: disable=import-outside-toplevel
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def copy_file_range(source: str, target: str) -> None:
+    copy_range = getattr(os, 'copy_file_range')
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        while remaining > 0:
+            copied = copy_range(src.fileno(), dst.fileno(), remaining)
+            if not copied:
+                break
+            remaining -= copied
+
+
+def copy(source: str, target: str) -> None:
+    shutil.copyfile(source, target)
+
+
+METHODS: Dict[str, Callable[[str, str], None]] = {
+    PUBLISH_HARDLINK: hardlink,
+    PUBLISH_REFLINK: reflink,
+    PUBLISH_COPY_FILE_RANGE: copy_file_range,
+    PUBLISH_COPY: copy,
+}
+
+
+class Publisher:
+    strategy: str
+    fingerprints: Fingerprints
+    unsupported: Set[Tuple[str, int]]
+    published: Dict[int, List[str]]
+    stats: Dict[str, int]
+    lock: threading.Lock
+
+    def __init__(self, strategy: str = PUBLISH_AUTO, fingerprints: Optional[Fingerprints] = None) -> None:
+        assert strategy in FALLBACKS, f'Unknown publish strategy "{strategy}".'
+        self.strategy = strategy
+        self.fingerprints = fingerprints or Fingerprints()
+        self.unsupported = set()
+        self.published = {}
+        self.stats = {}
+        # Files may be published from several threads at once.
+        self.lock = threading.Lock()
+
+    @property
+    def deduplicate(self) -> bool:
+        # Identical files are linked together only if hardlinks have been chosen, as they share any later change.
+        return self.strategy == PUBLISH_HARDLINK
+
+    def reset(self) -> None:
+        self.published.clear()
+        self.stats.clear()
+
+    def add(self, source: str, target: str) -> None:
+        # Files are grouped by size, so that only candidates for deduplication need to be hashed.
+        if self.deduplicate:
+            size = os.stat(source).st_size
+            with self.lock:
+                self.published.setdefault(size, []).append(target)
+
+    def publish(self, source: str, target: str) -> str:
+        stat = os.stat(source)
+        if self.is_unchanged(source, target, stat.st_size):
+            self.add(source, target)
+            return self._count(UNCHANGED)
+        duplicate = self.find_duplicate(source, target, stat.st_size) if self.deduplicate else None
+        if duplicate:
+            try:
+                self._replace(duplicate, target, PUBLISH_HARDLINK, hardlink)
+                if os.stat(target).st_mtime_ns < stat.st_mtime_ns:
+                    os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+                return self._count(DEDUPLICATED)
+            except OSError as e:
+                if e.errno not in FALLBACK_ERRORS:
+                    raise
+        for name in FALLBACKS[self.strategy]:
+            key = name, stat.st_dev
+            if key in self.unsupported:
+                continue
+            try:
+                self._replace(source, target, name, METHODS[name])
+            except (OSError, AttributeError) as e:
+                if isinstance(e, AttributeError) or e.errno in UNSUPPORTED_ERRORS:
+                    self.unsupported.add(key)
+                elif e.errno not in FALLBACK_ERRORS:
+                    raise
+                continue
+            self.add(source, target)
+            return self._count(name)
+        raise AssertionError(f'No publish strategy succeeded for "{source}".')
+
+    def is_unchanged(self, source: str, target: str, size: int) -> bool:
+        # Identical targets are left untouched, so that their mtime does not change and deploy tools skip them.
+        try:
+            if os.stat(target).st_size != size:
+                return False
+        except OSError:
+            return False
+        return self.fingerprints.digest(target) == self.fingerprints.digest(source)
+
+    def find_duplicate(self, source: str, target: str, size: int) -> Optional[str]:
+        with self.lock:
+            candidates = list(self.published.get(size, ()))
+        if not candidates or not size:
+            return None
+        digest = self.fingerprints.digest(source)
+        for other_target in candidates:
+            if other_target != target and self.fingerprints.digest(other_target) == digest:
+                return other_target
+        return None
+
+    @staticmethod
+    def _replace(source: str, target: str, name: str, method: Callable[[str, str], None]) -> None:
+        # The target is never written in place because it may be a hardlink to another file.
+        tmp_path = target + '.tmp'
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            method(source, tmp_path)
+            if name != PUBLISH_HARDLINK:
+                shutil.copystat(source, tmp_path)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _count(self, name: str) -> str:
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+        return name
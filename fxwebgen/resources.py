@@ -3,28 +3,72 @@
 
 import os
 from collections import defaultdict
-from typing import Dict, List, Set, Optional
+from typing import Dict, List, Set, Optional, Iterable
 
-from fxwebgen.utils import file_mtime
+from fxwebgen.fingerprints import Fingerprints
+from fxwebgen.scanner import Scanner
 
 SOURCE_NONE: str = ''
+FRESHNESS_MTIME = 'mtime'
+FRESHNESS_CONTENT = 'content'
+FRESHNESS_CHOICES: List[str] = [FRESHNESS_MTIME, FRESHNESS_CONTENT]
 
+Digests = Dict[str, Optional[str]]  # pylint: disable=invalid-name
 
+
+# pylint: disable=too-many-instance-attributes
 class Resource:
     kind: 'Kind'
     source: str
     target: str
-
-    def __init__(self, kind: 'Kind', source: Optional[str], target: str) -> None:
+    dependencies: Set[str]
+    fingerprints: Optional[Fingerprints]
+    digests: Digests
+    scanner: Optional[Scanner]
+    checked: Optional[float]
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, kind: 'Kind', source: Optional[str], target: str,
+                 dependencies: Optional[Iterable[str]] = None,
+                 fingerprints: Optional[Fingerprints] = None,
+                 digests: Optional[Digests] = None,
+                 scanner: Optional[Scanner] = None,
+                 checked: Optional[float] = None) -> None:
         self.source = source or SOURCE_NONE
         self.target = target
         self.kind = kind
+        self.dependencies = set(dependencies or ())
+        self.fingerprints = fingerprints
+        self.digests = digests if digests is not None else {}
+        self.scanner = scanner
+        self.checked = checked
+
+    @property
+    def inputs(self) -> Set[str]:
+        inputs = set(self.dependencies)
+        if self.source is not SOURCE_NONE:
+            inputs.add(self.source)
+        return inputs
 
     @property
     def fresh(self) -> bool:
-        if not all(os.path.isfile(path) for path in (self.target, self.source)):
+        scanner = self.scanner or Scanner()
+        if not scanner.isfile(self.target) or not scanner.isfile(self.source):
+            return False
+        fingerprints = self.fingerprints
+        if fingerprints is not None:
+            # The digests of inputs recorded when the target was built must match the current ones.
+            digests = self.digests
+            return bool(digests) and all(
+                path in digests and digests[path] == fingerprints.digest(path) for path in self.inputs)
+        target_mtime = scanner.mtime(self.target)
+        if self.checked is not None:
+            # An unchanged target is not rewritten, so it is as fresh as the inputs it was checked against.
+            target_mtime = max(target_mtime, self.checked)
+        if target_mtime < scanner.mtime(self.source):
             return False
-        return file_mtime(self.target) >= file_mtime(self.source)
+        # A missing dependency does not make the target stale, e.g. an optional template data file.
+        return all(target_mtime >= scanner.mtime(path) for path in self.dependencies)
 
     @property
     def source_exists(self) -> bool:
@@ -57,22 +101,34 @@ class Kind:
     __repr__ = __str__
 
 
+# pylint: disable=too-many-instance-attributes
 class ResourceManager:
     sources: Dict[str, Set[Resource]]
     targets: Dict[str, Resource]
     kinds: List[Kind]
+    fingerprints: Optional[Fingerprints]
+    digests: Dict[str, Digests]
+    checked: Dict[str, float]
+    index: Optional[Set[str]]
+    scanner: Scanner
 
-    def __init__(self) -> None:
+    def __init__(self, fingerprints: Optional[Fingerprints] = None, scanner: Optional[Scanner] = None) -> None:
         self.sources = defaultdict(set)
         self.targets = {}
         self.kinds = []
+        self.fingerprints = fingerprints
+        self.digests = {}
+        self.checked = {}
+        self.index = None
+        self.scanner = scanner or Scanner()
 
     def add_kind(self, name: str) -> Kind:
         kind = Kind(len(self.kinds), name)
         self.kinds.append(kind)
         return kind
 
-    def add(self, kind: Kind, source: Optional[str], target: str) -> Resource:
+    def add(self, kind: Kind, source: Optional[str], target: str,
+            dependencies: Optional[Iterable[str]] = None) -> Resource:
         if not source:
             source = SOURCE_NONE
         resource = self.targets.get(target)
@@ -81,8 +137,11 @@ class ResourceManager:
                 self.sources[resource.source].remove(resource)
                 resource.source = source
                 self.sources[source].add(resource)
+            if dependencies is not None:
+                resource.dependencies = set(dependencies)
         else:
-            resource = Resource(kind, source, target)
+            resource = Resource(kind, source, target, dependencies, self.fingerprints,
+                                self.digests.setdefault(target, {}), self.scanner, self.checked.get(target))
             self.sources[resource.source].add(resource)
             self.targets[resource.target] = resource
             kind.add(resource)
@@ -91,8 +150,27 @@ class ResourceManager:
     def remove(self, resource: Resource) -> None:
         self.sources[resource.source].remove(resource)
         del self.targets[resource.target]
+        self.digests.pop(resource.target, None)
+        self.checked.pop(resource.target, None)
         resource.kind.remove(resource)
 
+    def built(self, resource: Resource) -> None:
+        self.scanner.invalidate(resource.target)
+        self.checked.pop(resource.target, None)
+        resource.checked = None
+        fingerprints = self.fingerprints
+        if fingerprints is not None:
+            resource.digests.clear()
+            resource.digests.update((path, fingerprints.digest(path)) for path in resource.inputs)
+
+    def kept(self, resource: Resource) -> None:
+        # The target was rebuilt with the same content and left untouched, so its mtime is older than the inputs.
+        self.built(resource)
+        if self.fingerprints is None:
+            scanner = self.scanner
+            resource.checked = self.checked[resource.target] = max(
+                (scanner.mtime(path) for path in resource.inputs), default=-1)
+
     def remove_by_kind(self, kind: Kind) -> None:
         for resource in kind.resources:
             self.sources[resource.source].remove(resource)
@@ -100,7 +178,20 @@ class ResourceManager:
             del resource.kind
         kind.clear()
 
-    def remove_stale_files(self, target_dir: str) -> None:
+    def remove_stale_files(self, target_dir: str, *, deep: bool = False) -> None:
+        if deep or self.index is None:
+            self.remove_all_stale_files(target_dir)
+        else:
+            # Only the targets of the previous build that are no longer generated can be stale.
+            prefix = target_dir.rstrip('/') + '/'
+            for target in sorted(self.index.difference(self.targets)):
+                if target.startswith(prefix) and os.path.isfile(target):
+                    print(f'Remove: {target}')
+                    os.remove(target)
+                    remove_empty_dirs(os.path.dirname(target), target_dir)
+        self.index = set(self.targets)
+
+    def remove_all_stale_files(self, target_dir: str) -> None:
         if os.path.isdir(target_dir):
             for root, dirs, files in os.walk(target_dir, topdown=False):
                 for path in files:
@@ -118,3 +209,15 @@ class ResourceManager:
                     except OSError as e:
                         if e.errno != 39:
                             raise
+
+
+def remove_empty_dirs(path: str, root: str) -> None:
+    root = root.rstrip('/')
+    while path.startswith(root + '/'):
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            if e.errno != 39:
+                raise
+            break
+        path = os.path.dirname(path)
@@ -0,0 +1,66 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import os
+import stat as stat_module
+from typing import Dict, Optional, Iterator, Tuple, List
+
+
+class Scanner:
+    stats: Dict[str, Optional[os.stat_result]]
+
+    def __init__(self) -> None:
+        self.stats = {}
+
+    def clear(self) -> None:
+        self.stats.clear()
+
+    def invalidate(self, path: str) -> None:
+        self.stats.pop(path, None)
+
+    def stat(self, path: str) -> Optional[os.stat_result]:
+        try:
+            return self.stats[path]
+        except KeyError:
+            pass
+        try:
+            result: Optional[os.stat_result] = os.stat(path)
+        except OSError:
+            result = None
+        self.stats[path] = result
+        return result
+
+    def isfile(self, path: str) -> bool:
+        result = self.stat(path)
+        return result is not None and stat_module.S_ISREG(result.st_mode)
+
+    def mtime(self, path: str) -> float:
+        result = self.stat(path)
+        return result.st_mtime if result is not None else -1
+
+    def walk(self, root: str) -> Iterator[Tuple[str, List[str], List[str]]]:
+        # Like os.walk(), but the stat results of files are kept for the freshness checks.
+        dirs = []
+        subdirs = []
+        files = []
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            dirs.append(entry.name)
+                            # Symbolic links to directories are not followed, the same as os.walk() does.
+                            if not entry.is_symlink():
+                                subdirs.append(entry.path)
+                            continue
+                        result = entry.stat()
+                    except OSError:
+                        continue
+                    if stat_module.S_ISREG(result.st_mode):
+                        self.stats[entry.path] = result
+                        files.append(entry.name)
+        except OSError:
+            return
+        yield root, dirs, files
+        for path in subdirs:
+            yield from self.walk(path)
@@ -0,0 +1,119 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+import os
+import sqlite3
+from typing import Dict, List, Tuple, Optional, Set
+
+from fxwebgen.objects import Thumbnail
+from fxwebgen.resources import Digests
+from fxwebgen.typing import StrDict
+
+STATE_VERSION = 4
+
+SCHEMA = '''
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE resources (target TEXT PRIMARY KEY, kind TEXT NOT NULL, source TEXT NOT NULL);
+CREATE TABLE thumbnails (page TEXT NOT NULL, original_url TEXT NOT NULL, width INTEGER, height INTEGER);
+CREATE TABLE pages (source TEXT PRIMARY KEY, metadata TEXT NOT NULL);
+CREATE TABLE dependencies (target TEXT NOT NULL, path TEXT NOT NULL);
+CREATE TABLE digests (target TEXT NOT NULL, path TEXT NOT NULL, digest TEXT);
+CREATE TABLE checked (target TEXT PRIMARY KEY, mtime REAL NOT NULL);
+CREATE TABLE fingerprints (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, digest TEXT);
+'''
+
+
+# pylint: disable=too-many-instance-attributes
+class BuildState:
+    path: str
+    config: StrDict
+    resources: List[Tuple[str, str, str]]
+    dependencies: Dict[str, Set[str]]
+    digests: Dict[str, Digests]
+    checked: Dict[str, float]
+    fingerprints: List[Tuple[str, int, int, int, str]]
+    thumbnails: Dict[str, Dict[str, Thumbnail]]
+    pages: Dict[str, StrDict]
+
+    def __init__(self, path: str, config: Optional[StrDict] = None) -> None:
+        self.path = path
+        self.config = config or {}
+        self.reset()
+
+    def reset(self) -> None:
+        self.resources = []
+        self.dependencies = {}
+        self.digests = {}
+        self.checked = {}
+        self.fingerprints = []
+        self.thumbnails = {}
+        self.pages = {}
+
+    def load(self) -> bool:
+        self.reset()
+        if not os.path.isfile(self.path):
+            return False
+        try:
+            conn = sqlite3.connect(self.path)
+            try:
+                meta = dict(conn.execute('SELECT key, value FROM meta'))
+                if meta.get('version') != str(STATE_VERSION) or json.loads(meta.get('config', 'null')) != self.config:
+                    print(f'Build state: Ignoring outdated "{self.path}".')
+                    return False
+                self.resources = list(conn.execute('SELECT kind, source, target FROM resources'))
+                for target, path in conn.execute('SELECT target, path FROM dependencies'):
+                    self.dependencies.setdefault(target, set()).add(path)
+                for target, path, digest in conn.execute('SELECT target, path, digest FROM digests'):
+                    self.digests.setdefault(target, {})[path] = digest
+                self.checked = dict(conn.execute('SELECT target, mtime FROM checked'))
+                self.fingerprints = list(conn.execute(
+                    'SELECT path, size, mtime_ns, inode, digest FROM fingerprints'))
+                for page, original_url, width, height in conn.execute(
+                        'SELECT page, original_url, width, height FROM thumbnails'):
+                    thumbnail = Thumbnail(original_url, width, height)
+                    self.thumbnails.setdefault(page, {})[thumbnail.filename] = thumbnail
+                for source, metadata in conn.execute('SELECT source, metadata FROM pages'):
+                    self.pages[source] = json.loads(metadata)
+            finally:
+                conn.close()
+        except (sqlite3.Error, ValueError) as e:
+            print(f'Build state: Ignoring broken "{self.path}": {e}')
+            self.reset()
+            return False
+        return True
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            with conn:
+                conn.executescript(SCHEMA)
+                conn.executemany('INSERT INTO meta VALUES (?, ?)', [
+                    ('version', str(STATE_VERSION)),
+                    ('config', json.dumps(self.config, sort_keys=True)),
+                ])
+                conn.executemany('INSERT INTO resources (kind, source, target) VALUES (?, ?, ?)', self.resources)
+                conn.executemany('INSERT INTO dependencies VALUES (?, ?)', (
+                    (target, path) for target, paths in self.dependencies.items() for path in sorted(paths)))
+                conn.executemany('INSERT INTO digests VALUES (?, ?, ?)', (
+                    (target, path, digest) for target, digests in self.digests.items()
+                    for path, digest in digests.items()))
+                conn.executemany('INSERT INTO checked VALUES (?, ?)', self.checked.items())
+                conn.executemany('INSERT INTO fingerprints VALUES (?, ?, ?, ?, ?)', self.fingerprints)
+                conn.executemany('INSERT INTO thumbnails VALUES (?, ?, ?, ?)', (
+                    (page, thumbnail.original_url, thumbnail.width, thumbnail.height)
+                    for page, thumbnails in self.thumbnails.items() for thumbnail in thumbnails.values()))
+                conn.executemany('INSERT INTO pages VALUES (?, ?)', (
+                    (source, json.dumps(metadata, default=str)) for source, metadata in self.pages.items()))
+        finally:
+            conn.close()
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        self.reset()
+        if os.path.exists(self.path):
+            os.remove(self.path)
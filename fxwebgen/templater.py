@@ -3,19 +3,29 @@
 
 import json
 import os
-from typing import Dict, Any, Union, List, Tuple, Iterable, Mapping, Optional
+from typing import Dict, Any, Union, List, Tuple, Iterable, Mapping, Optional, Set, Iterator
 
-from jinja2 import Environment, FileSystemLoader, select_autoescape, Template, TemplateError
+from jinja2 import Environment, FileSystemLoader, select_autoescape, Template, TemplateError, meta, \
+    FileSystemBytecodeCache
+from jinja2.bccache import Bucket
+
+from fxwebgen.utils import file_mtime
 
 
 def to_dict(value: Iterable[Mapping], key: Any) -> Dict[Any, Mapping]:
     return {item[key]: item for item in value or []}
 
 
-def create_templater(template_dir: str, global_vars: Optional[Dict[str, Any]] = None) -> "Templater":
+def create_templater(template_dir: str, global_vars: Optional[Dict[str, Any]] = None,
+                     cache_dir: Optional[str] = None) -> "Templater":
+    bytecode_cache = None
+    if cache_dir:
+        # Compiled templates are keyed by a checksum of their source, so changed templates are never loaded.
+        bytecode_cache = LazyBytecodeCache(cache_dir, '%s.cache')
     env = Environment(
         loader=FileSystemLoader(template_dir),
-        autoescape=select_autoescape(['html', 'xml'])
+        autoescape=select_autoescape(['html', 'xml']),
+        bytecode_cache=bytecode_cache,
     )
     if global_vars:
         env.globals.update(global_vars)
@@ -23,47 +33,133 @@ def create_templater(template_dir: str, global_vars: Optional[Dict[str, Any]] =
     return Templater(template_dir, env)
 
 
+class LazyBytecodeCache(FileSystemBytecodeCache):
+    # The cache directory is created on the first write rather than when the configuration is parsed.
+
+    def dump_bytecode(self, bucket: Bucket) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+    def clear(self) -> None:
+        if os.path.isdir(self.directory):
+            super().clear()
+
+
 class Templater:
     env: Environment
     templates: Dict[str, Tuple[Template, dict]]
+    data_mtimes: Dict[str, float]
+    references: Dict[str, Tuple[float, List[Optional[str]], Set[str]]]
 
     def __init__(self, template_dir: str, env: Environment) -> None:
         self.template_dir = template_dir
         self.env = env
         self.templates = {}
+        self.data_mtimes = {}
+        self.references = {}
 
     def clear_cache(self) -> None:
         self.templates.clear()
+        self.data_mtimes.clear()
+        self.references.clear()
+        if self.env.cache is not None:
+            self.env.cache.clear()
+        if self.env.bytecode_cache:
+            self.env.bytecode_cache.clear()
+
+    def get_template_path(self, name: str) -> str:
+        return os.path.join(self.template_dir, *name.split('/'))
+
+    def get_template_data_path(self, name: str) -> str:
+        return os.path.join(self.template_dir, os.path.splitext(name)[0] + '.json')
 
     def load_template_data(self, name: str) -> dict:
-        path = os.path.join(self.template_dir, os.path.splitext(name)[0] + '.json')
+        path = self.get_template_data_path(name)
+        self.data_mtimes[name] = file_mtime(path)
         if os.path.isfile(path):
             with open(path) as fh:
                 data: dict = json.load(fh)
                 return data
         return {}
 
-    # pylint: disable=inconsistent-return-statements
+    def _is_up_to_date(self, name: str, template: Template) -> bool:
+        return template.is_up_to_date and self.data_mtimes.get(name) == file_mtime(self.get_template_data_path(name))
+
+    def get_dependencies(self, name: Union[str, List[str]]) -> Set[str]:
+        template, _data = self.get_template(name)
+        assert template.name
+        dependencies = {self.get_template_data_path(template.name)}
+        self._collect_dependencies(template.name, dependencies)
+        return dependencies
+
+    def _collect_dependencies(self, name: str, dependencies: Set[str]) -> None:
+        path = self.get_template_path(name)
+        if path in dependencies:
+            return
+        dependencies.add(path)
+        analysis = self._analyze(name)
+        if analysis:
+            # Dynamic references such as `{% include variable %}` are reported as None and cannot be tracked.
+            for reference in analysis[0]:
+                if reference:
+                    self._collect_dependencies(reference, dependencies)
+
+    def get_undeclared_variables(self, name: Union[str, List[str]]) -> Optional[Set[str]]:
+        # Returns None if the variables cannot be determined, e.g. because of dynamic references to other templates.
+        template, _data = self.get_template(name)
+        assert template.name
+        variables: Set[str] = set()
+        return variables if self._collect_variables(template.name, variables, set()) else None
+
+    def _collect_variables(self, name: str, variables: Set[str], visited: Set[str]) -> bool:
+        if name in visited:
+            return True
+        visited.add(name)
+        analysis = self._analyze(name)
+        if not analysis:
+            return False
+        references, undeclared = analysis
+        variables.update(undeclared)
+        return all(reference and self._collect_variables(reference, variables, visited) for reference in references)
+
+    def _analyze(self, name: str) -> Optional[Tuple[List[Optional[str]], Set[str]]]:
+        path = self.get_template_path(name)
+        mtime = file_mtime(path)
+        try:
+            cached_mtime, references, undeclared = self.references[path]
+            if cached_mtime == mtime:
+                return references, undeclared
+        except KeyError:
+            pass
+        assert self.env.loader
+        try:
+            source, _filename, _uptodate = self.env.loader.get_source(self.env, name)
+        except TemplateError:
+            return None
+        ast = self.env.parse(source)
+        references = list(meta.find_referenced_templates(ast))
+        undeclared = meta.find_undeclared_variables(ast)
+        self.references[path] = mtime, references, undeclared
+        return references, undeclared
+
     def get_template(self, name: Union[str, List[str]]) -> Tuple[Template, dict]:
         if isinstance(name, str):
-            try:
-                return self.templates[name]
-            except KeyError:
+            result = self.templates.get(name)
+            if result is None or not self._is_up_to_date(name, result[0]):
                 template = self.env.get_template(name)
                 data = self.load_template_data(name)
                 result = template, data
                 self.templates[name] = result
-                return result
-        elif not name:
+            return result
+        if not name:
             raise ValueError("Template list must not be empty")
-        else:
-            errors = []
-            for item in name:
-                try:
-                    return self.get_template(item)
-                except TemplateError as e:
-                    errors.append(e)
-            raise ValueError(errors)
+        errors = []
+        for item in name:
+            try:
+                return self.get_template(item)
+            except TemplateError as e:
+                errors.append(e)
+        raise ValueError(errors)
 
     def render(self, name: Union[str, List[str]], variables: Dict[str, Any]) -> str:
         template, data = self.get_template(name)
@@ -71,3 +167,12 @@ class Templater:
         result = template.render(**variables)
         del variables['data']
         return result
+
+    def generate(self, name: Union[str, List[str]], variables: Dict[str, Any]) -> Iterator[str]:
+        # Like render(), but the result is produced in chunks, so that large pages need not be kept in memory.
+        template, data = self.get_template(name)
+        variables['data'] = data
+        try:
+            yield from template.generate(**variables)
+        finally:
+            del variables['data']
@@ -0,0 +1,53 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import hashlib
+import os
+import shutil
+from typing import Optional
+
+import PIL
+
+from fxwebgen import imaging
+
+# Cached thumbnails must not be reused when the encoder output could differ.
+ENCODER_SETTINGS = f'fxwebgen-imaging-{imaging.ENCODER_VERSION}/pillow-{PIL.__version__}'
+
+
+class ThumbnailCache:
+    cache_dir: str
+    settings: str
+
+    def __init__(self, cache_dir: str, settings: str = ENCODER_SETTINGS) -> None:
+        self.cache_dir = cache_dir
+        self.settings = hashlib.sha1(settings.encode('utf-8')).hexdigest()[:8]
+
+    def get_path(self, digest: str, width: Optional[int], height: Optional[int], extension: str) -> str:
+        size = f'{width or ""}x{height or ""}'
+        return os.path.join(self.cache_dir, digest[:2], f'{digest[2:]}-{size}-{self.settings}{extension}')
+
+    @staticmethod
+    def get_tmp_path(path: str) -> str:
+        # Keep the extension because Pillow derives the image format from it.
+        base, extension = os.path.splitext(path)
+        return f'{base}.{os.getpid()}.tmp{extension}'
+
+    def prepare(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return self.get_tmp_path(path)
+
+    def store(self, tmp_path: str, path: str) -> None:
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def install(path: str, target: str) -> None:
+        # The target is replaced rather than overwritten because it may be a hardlink to another cached file.
+        tmp_path = target + '.tmp'
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(path, tmp_path)
+        except OSError:
+            shutil.copy2(path, tmp_path)
+        os.replace(tmp_path, target)
+        os.utime(target)
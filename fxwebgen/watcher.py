@@ -0,0 +1,167 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from typing import List, Set, Dict, Tuple, Optional
+
+DEFAULT_DELAY = 0.1
+POLL_INTERVAL = 0.5
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+              | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class Watcher:
+    roots: List[str]
+    delay: float
+
+    def __init__(self, roots: List[str], delay: float = DEFAULT_DELAY) -> None:
+        self.roots = [root.rstrip('/') for root in roots if os.path.isdir(root)]
+        self.delay = delay
+
+    def wait(self) -> Set[str]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher(Watcher):
+    fd: int
+    watches: Dict[int, str]
+
+    def __init__(self, roots: List[str], delay: float = DEFAULT_DELAY) -> None:
+        super().__init__(roots, delay)
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watches = {}
+        for root in self.roots:
+            self._add_tree(root)
+
+    def _add_tree(self, path: str) -> List[str]:
+        files: List[str] = []
+        for root, _dirs, names in os.walk(path):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(root), WATCH_MASK)
+            if wd >= 0:
+                self.watches[wd] = root
+            files.extend(os.path.join(root, name) for name in names)
+        return files
+
+    def wait(self) -> Set[str]:
+        changes: Set[str] = set()
+        timeout: Optional[float] = None
+        # Block until the first event and then collect more events until there is a quiet period of `delay`.
+        while True:
+            readable, _, _ = select.select([self.fd], [], [], timeout)
+            if not readable:
+                if changes:
+                    return changes
+                continue
+            if self._read_events(changes):
+                return set(self.roots)
+            timeout = self.delay
+
+    def _read_events(self, changes: Set[str]) -> bool:
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return True
+            root = self.watches.get(wd)
+            if root is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            path = os.path.join(root, name) if name else root
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                changes.update(self._add_tree(path))
+            elif mask & IN_ISDIR and mask & IN_MOVED_FROM or mask & IN_MOVE_SELF:
+                # The watches follow a moved directory, so they would report its files under the old path.
+                self._remove_tree(path)
+            changes.add(path)
+        return False
+
+    def _remove_tree(self, path: str) -> None:
+        prefix = path + '/'
+        for wd, root in list(self.watches.items()):
+            if root == path or root.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher(Watcher):
+    snapshot: Dict[str, Tuple[int, int]]
+
+    def __init__(self, roots: List[str], delay: float = DEFAULT_DELAY, interval: float = POLL_INTERVAL) -> None:
+        super().__init__(roots, delay)
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for root in self.roots:
+            for dir_path, _dirs, names in os.walk(root):
+                for name in names:
+                    path = os.path.join(dir_path, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    snapshot[path] = stat.st_mtime_ns, stat.st_size
+        return snapshot
+
+    def wait(self) -> Set[str]:
+        changes: Set[str] = set()
+        while True:
+            time.sleep(self.delay if changes else self.interval)
+            snapshot = self._scan()
+            old_snapshot = self.snapshot
+            self.snapshot = snapshot
+            changed = {path for path in old_snapshot.keys() | snapshot.keys()
+                       if old_snapshot.get(path) != snapshot.get(path)}
+            if changed:
+                changes.update(changed)
+            elif changes:
+                return changes
+
+
+def create_watcher(roots: List[str], delay: float = DEFAULT_DELAY) -> Watcher:
+    try:
+        return InotifyWatcher(roots, delay)
+    except (OSError, AttributeError) as e:
+        print(f'Watch: inotify is not available ({e}), falling back to polling.')
+        return PollingWatcher(roots, delay)
@@ -1,10 +1,17 @@
 import pathlib
-from typing import Union, IO, Optional, Any
+from typing import Union, IO, Optional, Any, Tuple
 
 
 class Image:
     format: Optional[str]
+    mode: str
+    size: Tuple[int, int]
     def save(self, fp: Union[str, pathlib.Path, IO[bytes]], format: Optional[str] = None, **params: Any) -> None: ...
+    def draft(self, mode: Optional[str], size: Tuple[int, int]) -> Any: ...
+    def load(self) -> Any: ...
+    def reduce(self, factor: Union[int, Tuple[int, int]]) -> 'Image': ...
+    def copy(self) -> 'Image': ...
+    def thumbnail(self, size: Tuple[int, int], resample: int = ...) -> None: ...
 
 def open(fp: Union[str, pathlib.Path, IO[bytes]], mode: str = "r") -> Image: ...
-
+def new(mode: str, size: Tuple[int, int], color: Union[int, Tuple[int, ...], str, None] = ...) -> Image: ...
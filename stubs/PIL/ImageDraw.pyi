@@ -0,0 +1,10 @@
+from typing import Union, Tuple, Sequence, Optional, Any
+
+from PIL.Image import Image
+
+
+class ImageDraw:
+    def line(self, xy: Sequence[Union[float, Tuple[float, float]]], fill: Optional[Any] = None,
+             width: int = 0) -> None: ...
+
+def Draw(im: Image, mode: Optional[str] = None) -> ImageDraw: ...
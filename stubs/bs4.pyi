@@ -1,4 +1,4 @@
-from typing import Any, Optional
+from typing import Any, Optional, Dict, Iterator
 
 DEFAULT_OUTPUT_ENCODING: str
 
@@ -8,7 +8,14 @@ class ResultSet(list):
 
 
 class Tag:
+    name: str
     string: str
+    attrs: Dict[str, Any]
+    contents: list
+    descendants: Iterator[Any]
+    html: Optional[Tag]
+    head: Optional[Tag]
+    body: Optional[Tag]
 
     def __init__(self, name: str) -> None: ...
 
@@ -26,15 +33,27 @@ class Tag:
 
     def __setitem__(self, key: str, value: Any) -> None: ...
 
+    def __getitem__(self, key: str) -> Any: ...
+
+    def get(self, key: str, default: Any = None) -> Any: ...
+
+    def extract(self) -> Tag: ...
+
+    def clear(self, decompose: bool = False) -> None: ...
+
+    def decode(self, indent_level: Optional[int] = None,
+               eventual_encoding: str = DEFAULT_OUTPUT_ENCODING,
+               formatter: str = "minimal") -> str: ...
+
+    def decode_contents(self, indent_level: Optional[int] = None,
+                        eventual_encoding: str = DEFAULT_OUTPUT_ENCODING,
+                        formatter: str = "minimal") -> str: ...
+
+    def decompose(self) -> None: ...
+
 
 class BeautifulSoup(Tag):
     def __init__(self, markup: str = "", features: Any = None, builder: Any = None,
                  parse_only: Any = None, from_encoding: Any = None, exclude_encodings: Any = None,
                  **kwargs: Any) -> None:
         pass
-
-    def decode(self, pretty_print: bool = False,
-               eventual_encoding: str = DEFAULT_OUTPUT_ENCODING,
-               formatter: str = "minimal") -> str:
-        pass
-
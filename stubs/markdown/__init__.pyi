@@ -1,6 +1,7 @@
-from typing import List, Optional
+from typing import List, Optional, Callable
 
 from markdown import util
+import xml.etree.ElementTree as etree
 from markdown.extensions import Extension
 from .blockparser import BlockParser
 
@@ -10,6 +11,13 @@ class Markdown:
     references: dict
     preprocessors: util.Registry
     parser: BlockParser
+    treeprocessors: util.Registry
+    postprocessors: util.Registry
+    htmlStash: util.HtmlStash
+    serializer: Callable[[etree.Element], str]
+    stripTopLevelTags: bool
+    doc_tag: str
+    lines: List[str]
 
     def __init__(self,
                  extensions: List[str],
@@ -22,3 +30,6 @@ class Markdown:
 
     def registerExtension(self, extension: Extension) -> Markdown:
         pass
+
+    def reset(self) -> Markdown:
+        pass
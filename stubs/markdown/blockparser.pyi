@@ -10,3 +10,5 @@ class BlockParser:
 
     def parseBlocks(self, parent: etree.Element, blocks: List[str]) -> None: ...
 
+    def parseDocument(self, lines: List[str]) -> etree.ElementTree: ...
+
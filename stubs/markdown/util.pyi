@@ -1,6 +1,6 @@
 # noinspection PyPep8Naming
 import xml.etree.ElementTree as etree
-from typing import Optional, Any
+from typing import Optional, Any, Iterator, List
 
 import markdown as md
 
@@ -15,8 +15,14 @@ class Processor:
         pass
 
 
+class HtmlStash:
+    rawHtmlBlocks: List[Any]
+
+
 class Registry(object):
+    def __iter__(self) -> Iterator[Any]: ...
     def get_index_for_name(self, name: str) -> int: ...
     def register(self, item: Any, name: str, priority: int) -> None: ...
     def deregister(self, name: str, strict: bool = True) -> None: ...
     def add(self, key: str, value: Any, location: str) -> None: ...
+    def __getitem__(self, key: str) -> Any: ...
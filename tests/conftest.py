@@ -0,0 +1,89 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import os
+from typing import Dict, Any, Callable
+
+import pytest
+from PIL import Image
+
+from fxwebgen.context import Context
+from fxwebgen.generator import Generator
+from fxwebgen.postprocessor import PostProcessor
+from fxwebgen.templater import create_templater
+
+GLOBAL_VARS = {
+    'project': {'name': 'Test', 'version': '1.0'},
+}
+TEMPLATES = {
+    'page.html': '<!DOCTYPE html>\n<html><head><title>{{ title }}</title></head>\n<body>\n'
+                 '{% if toc %}<aside>{{ toc|safe }}</aside>{% endif %}\n'
+                 '<main>\n{{ body|safe }}\n</main>\n'
+                 '<ul>{% for item in datasets.entries %}<li>{{ item.name }}</li>{% endfor %}</ul>\n'
+                 '</body></html>\n',
+    'snippets/notice.html': '<strong class="notice">{{ title }}</strong>',
+}
+PAGES = {
+    'index.md': 'Title: Home\nDatasets: entries\n\n[TOC]\n\n# Home\n\n'
+                'Welcome to ${project.name} ${project.version}.\n\n'
+                '## Links\n\n[About](:about/index.html), [Guide](guide.html) and [Nested](:docs/nested.html).\n',
+    'about/index.md': 'Title: About\nSnippets: Notice\n\n[Snippet: Notice] An about page.\n\n'
+                      '!!! warning "Be careful"\n    Text of the admonition.\n\n'
+                      '![Logo](:static/logo.png|32x32)\n',
+    'docs/nested.md': 'Title: Nested\n\n{$ note.md $}\n\nA footnote[^1].\n\n    :::python\n    print("code")\n\n'
+                      '[^1]: The footnote.\n',
+    'guide.html': '<html><head><title>Guide</title><meta name="path" content="/guide.html"/></head>'
+                  '<body><h1>Guide</h1><p>An <a href=":index.html">HTML</a> page.</p></body></html>',
+}
+
+
+def write(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wt', encoding='utf-8') as fh:
+        fh.write(content)
+
+
+def read_tree(root: str) -> Dict[str, bytes]:
+    files = {}
+    for base, _dirs, names in os.walk(root):
+        for name in names:
+            path = os.path.join(base, name)
+            with open(path, 'rb') as fh:
+                files[os.path.relpath(path, root)] = fh.read()
+    return files
+
+
+@pytest.fixture
+def site(tmp_path: Any) -> str:
+    root = str(tmp_path)
+    for name, content in TEMPLATES.items():
+        write(os.path.join(root, 'templates', name), content)
+    for name, content in PAGES.items():
+        write(os.path.join(root, 'pages', name), content)
+    write(os.path.join(root, 'snippets', 'note.md'), 'A note included from a snippet.\n')
+    write(os.path.join(root, 'datasets', 'entries.json'), '[{"name": "first"}, {"name": "second"}]')
+    write(os.path.join(root, 'static', 'style.css'), 'body { color: black; }\n')
+    write(os.path.join(root, 'static', 'js', 'main.js'), 'console.log("main");\n')
+    Image.new('RGB', (64, 64), (200, 100, 50)).save(os.path.join(root, 'static', 'logo.png'))
+    return root
+
+
+def create_context(root: str, output: str = 'output', **kwargs: Any) -> Context:
+    cache_dir = kwargs.pop('cache_dir', os.path.join(root, 'cache'))
+    templater = create_templater(os.path.join(root, 'templates'), GLOBAL_VARS,
+                                 os.path.join(cache_dir, 'jinja2') if cache_dir else None)
+    return Context(templater, os.path.join(root, output),
+                   pages_dir=os.path.join(root, 'pages'),
+                   static_dirs=[os.path.join(root, 'static')],
+                   datasets_dir=os.path.join(root, 'datasets'),
+                   snippets_dir=os.path.join(root, 'snippets'),
+                   global_vars=GLOBAL_VARS,
+                   cache_dir=cache_dir,
+                   **kwargs)
+
+
+@pytest.fixture
+def generator_factory(site: str) -> Callable[..., Generator]:
+    def factory(**kwargs: Any) -> Generator:
+        return Generator(create_context(site, **kwargs), post_processor=PostProcessor())
+    return factory
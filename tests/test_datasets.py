@@ -0,0 +1,61 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+import os
+import pickle
+import timeit
+from typing import Any
+
+import pytest
+
+from fxwebgen.datasets import Datasets, FrozenDict, FrozenList, freeze
+
+from conftest import write
+
+
+def create_dataset(count: int) -> Any:
+    return [{'name': f'item {i}', 'tags': ['a', 'b', 'c'], 'meta': {'index': i, 'size': [i, i * 2]}}
+            for i in range(count)]
+
+
+def test_nested_containers_are_frozen_on_access() -> None:
+    data = {'entries': [{'name': 'first', 'tags': ['a']}], 'meta': {'count': 1}}
+    frozen = freeze(data)
+    assert frozen == data
+    assert isinstance(frozen['entries'], FrozenList)
+    assert isinstance(frozen['entries'][0], FrozenDict)
+    assert isinstance(frozen.get('meta'), FrozenDict)
+    assert all(isinstance(value, FrozenDict) for value in dict(frozen)['entries'])
+    assert isinstance(list(frozen['entries'])[0]['tags'], FrozenList)
+    assert pickle.loads(pickle.dumps(frozen)) == data
+    assert json.loads(json.dumps(frozen)) == data
+    with pytest.raises(TypeError):
+        frozen['entries'][0]['tags'].append('b')
+    with pytest.raises(TypeError):
+        dict(frozen)['meta']['count'] = 2
+    assert data == {'entries': [{'name': 'first', 'tags': ['a']}], 'meta': {'count': 1}}
+
+
+def test_cached_dataset_loads_faster_than_json(tmp_path: Any) -> None:
+    root = str(tmp_path)
+    data = create_dataset(20000)
+    source = json.dumps(data)
+    write(os.path.join(root, 'datasets', 'big.json'), source)
+    datasets_dir = os.path.join(root, 'datasets')
+    cache_dir = os.path.join(root, 'cache')
+    assert Datasets(datasets_dir, cache_dir).get('big') == data
+    assert os.path.isfile(Datasets(datasets_dir, cache_dir).get_cache_path('big'))
+
+    def load_cached() -> Any:
+        # A new instance does not reuse the loaded data like a new fxwebgen process.
+        return Datasets(datasets_dir, cache_dir).get('big')
+
+    def load_json() -> Any:
+        with open(os.path.join(datasets_dir, 'big.json'), 'rb') as fh:
+            return json.loads(fh.read())
+
+    assert load_cached() == data
+    cached = min(timeit.repeat(load_cached, number=1, repeat=5))
+    plain = min(timeit.repeat(load_json, number=1, repeat=5))
+    assert cached < plain, (cached, plain)
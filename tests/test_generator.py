@@ -0,0 +1,133 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+import os
+import time
+from typing import Callable
+
+import pytest
+
+from fxwebgen.generator import Generator
+from fxwebgen.profiler import Profiler, SUMMARY_FILE
+from fxwebgen.resources import FRESHNESS_MTIME, FRESHNESS_CONTENT
+
+from conftest import read_tree, write
+
+
+def touch(path: str) -> None:
+    mtime = max(time.time(), os.path.getmtime(path) + 1)
+    os.utime(path, (mtime, mtime))
+
+
+def test_build(site: str, generator_factory: Callable[..., Generator]) -> None:
+    generator_factory().build()
+    files = read_tree(os.path.join(site, 'output'))
+    assert set(files) == {
+        'index.html', 'about/index.html', 'docs/nested.html', 'guide.html', 'static/style.css', 'static/js/main.js',
+        'static/logo.png', 'static/logo[32x32].png'}
+    index = files['index.html'].decode('utf-8')
+    assert 'Welcome to Test 1.0.' in index
+    assert '<li>first</li><li>second</li>' in index
+    assert '<a href="./about/index.html">About</a>' in index
+    about = files['about/index.html'].decode('utf-8')
+    assert '<strong class="notice">About</strong>' in about
+    assert 'card border-warning' in about
+    assert 'A note included from a snippet.' in files['docs/nested.html'].decode('utf-8')
+
+
+def test_parallel_build_matches_serial_build(site: str, generator_factory: Callable[..., Generator]) -> None:
+    generator_factory(output='serial', cache_dir=os.path.join(site, 'cache-serial'), jobs=1).build()
+    generator_factory(output='parallel', cache_dir=os.path.join(site, 'cache-parallel'), jobs=3).build()
+    serial = read_tree(os.path.join(site, 'serial'))
+    assert serial
+    assert read_tree(os.path.join(site, 'parallel')) == serial
+
+
+@pytest.mark.parametrize('freshness', [FRESHNESS_MTIME, FRESHNESS_CONTENT])
+def test_freshness_modes_produce_the_same_output(site: str, generator_factory: Callable[..., Generator],
+                                                 freshness: str) -> None:
+    generator_factory(output='reference', cache_dir=None).build()
+    generator_factory(freshness=freshness).build()
+    write(os.path.join(site, 'pages', 'index.md'), '# Home\n\nChanged.\n')
+    write(os.path.join(site, 'pages', 'about', 'index.md'), '# About\n\nChanged too.\n')
+    touch(os.path.join(site, 'templates', 'page.html'))
+    # A new generator loads the build state of the previous one like a new fxwebgen process.
+    generator_factory(freshness=freshness).build()
+    generator_factory(output='reference', cache_dir=None).build()
+    assert read_tree(os.path.join(site, 'output')) == read_tree(os.path.join(site, 'reference'))
+
+
+@pytest.mark.parametrize('freshness,rebuilt', [(FRESHNESS_MTIME, True), (FRESHNESS_CONTENT, False)])
+def test_touched_page_is_rebuilt_only_with_mtime_freshness(
+        site: str, generator_factory: Callable[..., Generator], capsys: pytest.CaptureFixture,
+        freshness: str, rebuilt: bool) -> None:
+    generator_factory(freshness=freshness).build()
+    touch(os.path.join(site, 'pages', 'index.md'))
+    capsys.readouterr()
+    generator_factory(freshness=freshness).build()
+    output = capsys.readouterr().out
+    assert ('index.md" →' in output) == rebuilt
+    assert 'about/index.md" →' not in output
+
+
+def test_unchanged_page_is_not_rebuilt(site: str, generator_factory: Callable[..., Generator],
+                                       capsys: pytest.CaptureFixture) -> None:
+    generator_factory().build()
+    capsys.readouterr()
+    generator_factory().build()
+    assert 'Page: ' not in capsys.readouterr().out
+
+
+def test_stale_files_are_removed_using_the_index(site: str, generator_factory: Callable[..., Generator]) -> None:
+    generator_factory().build()
+    output = os.path.join(site, 'output')
+    manual = os.path.join(output, 'manual.txt')
+    write(manual, 'Not generated by fxwebgen.')
+    os.remove(os.path.join(site, 'pages', 'docs', 'nested.md'))
+    os.remove(os.path.join(site, 'static', 'js', 'main.js'))
+    generator_factory().build()
+    files = read_tree(output)
+    assert 'docs/nested.html' not in files
+    assert 'static/js/main.js' not in files
+    assert not os.path.exists(os.path.join(output, 'docs'))
+    # Only the files of the previous build are considered, unless a deep clean is requested.
+    assert 'manual.txt' in files
+    generator_factory().build(deep_clean=True)
+    assert not os.path.exists(manual)
+
+
+def test_update_removes_pages_of_a_moved_directory(site: str, generator_factory: Callable[..., Generator]) -> None:
+    generator = generator_factory()
+    generator.build()
+    docs = os.path.join(site, 'pages', 'docs')
+    moved = os.path.join(site, 'moved-docs')
+    os.rename(docs, moved)
+    generator.update([docs])
+    assert not os.path.exists(os.path.join(site, 'output', 'docs', 'nested.html'))
+    os.rename(moved, docs)
+    generator.update([docs])
+    assert os.path.isfile(os.path.join(site, 'output', 'docs', 'nested.html'))
+
+
+def test_bytecode_cache_directory_is_created_on_first_write(site: str,
+                                                            generator_factory: Callable[..., Generator]) -> None:
+    generator = generator_factory()
+    cache_dir = os.path.join(site, 'cache', 'jinja2')
+    generator.ctx.templater.clear_cache()
+    assert not os.path.exists(cache_dir)
+    generator.build()
+    assert os.listdir(cache_dir)
+
+
+def test_update_writes_the_profile(site: str, generator_factory: Callable[..., Generator]) -> None:
+    profile_dir = os.path.join(site, 'profile')
+    generator = generator_factory(profiler=Profiler(profile_dir))
+    generator.build()
+    page = os.path.join(site, 'pages', 'index.md')
+    write(page, '# Home\n\nChanged.\n')
+    generator.update([page])
+    with open(os.path.join(profile_dir, SUMMARY_FILE), encoding='utf-8') as fh:
+        summary = json.load(fh)
+    assert summary['pages'] == 1
+    assert 'update' in {stage['name'] for stage in summary['slowest_stages']}
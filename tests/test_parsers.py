@@ -0,0 +1,47 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import importlib.util
+import os
+
+import pytest
+
+from fxwebgen.generator import Generator
+from fxwebgen.parsers import HTML_PARSER_AUTO, HTML_PARSER_LXML, HTML_PARSER_PYTHON, HtmlFragment, get_html_parser
+from fxwebgen.postprocessor import PostProcessor
+
+from conftest import create_context, read_tree, write
+from test_postprocessor import ETREE_PAGES, SOUP_PAGES
+
+requires_lxml = pytest.mark.skipif(not importlib.util.find_spec('lxml'), reason='lxml is not installed')
+PAGES = {
+    'interlinks.md': 'Title: Interlinks\n\n[Self](this>index.html) and ![Logo](:static/logo.png|16x16).\n',
+    'table.html': '<html><head><title>Table</title></head><body><h2>Table</h2><table><tr><td>A&amp;B</td></tr>'
+                  '</table><p>An <img src=":static/logo.png|8x8"/> image.</p>\n\n<div class="admonition note">'
+                  '<p class="admonition-title">Note</p>\n<p>Text.</p></div></body></html>',
+}
+
+
+@requires_lxml
+def test_parsers_produce_the_same_output(site: str) -> None:
+    for name, content in {**PAGES, **ETREE_PAGES, **SOUP_PAGES}.items():
+        write(os.path.join(site, 'pages', 'extra', name), content)
+    for parser in HTML_PARSER_PYTHON, HTML_PARSER_LXML:
+        # All pages are post-processed with BeautifulSoup.
+        ctx = create_context(site, parser, cache_dir=None, html_parser=parser)
+        Generator(ctx, post_processor=PostProcessor(use_etree=False)).build()
+    expected = read_tree(os.path.join(site, HTML_PARSER_PYTHON))
+    assert len(expected) > len(PAGES) + len(ETREE_PAGES) + len(SOUP_PAGES)
+    assert read_tree(os.path.join(site, HTML_PARSER_LXML)) == expected
+
+
+@requires_lxml
+def test_lxml_repairs_invalid_html() -> None:
+    html = '<p>Text <div>block</div></p>'
+    assert HtmlFragment(html, HTML_PARSER_PYTHON).decode() == html
+    assert HtmlFragment(html, HTML_PARSER_LXML).decode() == '<p>Text </p><div>block</div>'
+
+
+def test_unsupported_parser_falls_back_to_html_parser() -> None:
+    assert get_html_parser('html5lib') == HTML_PARSER_PYTHON
+    assert get_html_parser(HTML_PARSER_AUTO) in (HTML_PARSER_LXML, HTML_PARSER_PYTHON)
@@ -0,0 +1,87 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import importlib.util
+import os
+from typing import Any, Dict
+
+import pytest
+
+from fxwebgen import postprocessor
+from fxwebgen.generator import Generator
+from fxwebgen.parsers import HTML_PARSER_PYTHON, HTML_PARSER_LXML
+from fxwebgen.postprocessor import PostProcessor, normalize_html
+
+from conftest import create_context, read_tree, write
+
+# Pages processed with ElementTree, the raw HTML of the last ones is left to BeautifulSoup.
+ETREE_PAGES = {
+    'toc-first.md': '[TOC]\n\n## First\n\nText.\n\n## Second\n\nMore text.\n',
+    'toc-last.md': 'Intro.\n\n## First\n\nText.\n\n[TOC]\n',
+    'entities.md': 'Title: Entities «ü»\n\nSome text — with “quotes”, &amp; &lt;tag&gt; &copy; and&nbsp;space.\n',
+    'code.md': 'Text.\n\n    :::python\n    x = "<a>" & 1\n\n```\nplain  <code>\n\n  indented\n```\n',
+    'misc.md': 'A [link](http://example.com/?a=1&b=2 "Title \\"q\\"") and `code <x> &amp;`.\n\n'
+               '> Quote.\n\n1. One\n2. Two\n\nTerm\n:   Definition\n\n*[HTML]: Hyper Text Markup Language\n\n'
+               'HTML and a footnote[^1].\n\nLine  \nbreak.\n\n---\n\n{. text-muted} Span.\n\n[^1]: Note.\n',
+    'raw.md': 'Inline <span class="a  b" title="say &quot;hi&quot; it\'s">raw</span>, <br> and <em>x</em>.\n\n'
+              '<!-- comment -->\n\n<div class="x">\n<p>Block &copy; <b>bold</b></p>\n</div>\n\nAfter.\n',
+    'admonitions.md': '!!! note\n    Without a title.\n\n!!! danger "Title"\n    One.\n\n    Two.\n',
+}
+SOUP_PAGES = {
+    'quotes.md': 'Inline <span title=\'say "hi"\'>raw</span>.\n',
+    'uppercase.md': 'Text <SPAN CLASS=foo>upper</SPAN>.\n',
+    'script.md': 'Text.\n\n<script>var a = "<b>" && 1;</script>\n',
+    'unbalanced.md': 'Unbalanced <span>open.\n\n<div>\n',
+}
+PARSERS = [HTML_PARSER_PYTHON, pytest.param(HTML_PARSER_LXML, marks=pytest.mark.skipif(
+    not importlib.util.find_spec('lxml'), reason='lxml is not installed'))]
+
+
+def add_pages(site: str, pages: Dict[str, str]) -> None:
+    for name, content in pages.items():
+        write(os.path.join(site, 'pages', 'extra', name), content)
+
+
+@pytest.mark.parametrize('title_as_heading', [False, True])
+@pytest.mark.parametrize('html_parser', PARSERS)
+def test_etree_output_matches_beautifulsoup_output(site: str, html_parser: str, title_as_heading: bool) -> None:
+    add_pages(site, ETREE_PAGES)
+    add_pages(site, SOUP_PAGES)
+    for output, use_etree in ('soup', False), ('etree', True):
+        ctx = create_context(site, output, cache_dir=None, html_parser=html_parser, title_as_heading=title_as_heading)
+        Generator(ctx, post_processor=PostProcessor(use_etree=use_etree)).build()
+    soup = read_tree(os.path.join(site, 'soup'))
+    assert len(soup) > len(ETREE_PAGES) + len(SOUP_PAGES)
+    assert read_tree(os.path.join(site, 'etree')) == soup
+
+
+def test_etree_path_is_used_for_simple_raw_html(site: str, monkeypatch: Any) -> None:
+    add_pages(site, ETREE_PAGES)
+
+    def fail(*_args: Any) -> None:
+        raise AssertionError('BeautifulSoup is used.')
+
+    monkeypatch.setattr(postprocessor, 'HtmlFragment', fail)
+    ctx = create_context(site, cache_dir=None)
+    generator = Generator(ctx, post_processor=PostProcessor())
+    for name in ETREE_PAGES:
+        assert generator.process_page(os.path.join(site, 'pages', 'extra', name), f'extra/{name}').built
+
+
+@pytest.mark.parametrize('html,expected', [
+    ('<p>a&#160;&#8617; &quot;&copy;&amp;</p>', '<p>a\xa0↩ "©&amp;</p>'),
+    ('<div>\n\n\n<p>x</p>  </div>', '<div>\n<p>x</p> </div>'),
+    ('<pre>\n\n  <span> </span>\n\n</pre>', '<pre>\n\n  <span> </span>\n\n</pre>'),
+    ('<a class=" a  b " title="&quot;x&quot;">y</a>', '<a class="a b" title=\'"x"\'>y</a>'),
+    ('<img alt="a&amp;b" src="x.png" />', '<img alt="a&amp;b" src="x.png"/>'),
+    ('<p>a<!-- &copy; -->b</p>', '<p>a<!-- &copy; -->b</p>'),
+    ('a\x00b', 'ab'),
+    ('<p>\n\x00\n</p>', '<p>\n\n</p>'),
+])
+def test_normalize_html(html: str, expected: str) -> None:
+    assert normalize_html(html) == expected
+
+
+@pytest.mark.parametrize('html', ['<p>x', '</p>', '<br></br>', '<div/>', '<script>x</script>', 'a < b', "<a b='c'>"])
+def test_normalize_html_rejects_html_needing_a_parser(html: str) -> None:
+    assert normalize_html(html) is None
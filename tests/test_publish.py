@@ -0,0 +1,42 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import errno
+import os
+from typing import Any
+
+from fxwebgen import publish
+from fxwebgen.publish import Publisher, PUBLISH_AUTO, PUBLISH_COPY, PUBLISH_HARDLINK, DEDUPLICATED
+
+from conftest import write
+
+
+def publish_twins(tmp_path: Any, strategy: str) -> Publisher:
+    root = str(tmp_path)
+    publisher = Publisher(strategy)
+    os.makedirs(os.path.join(root, 'out'), exist_ok=True)
+    for name in 'a', 'b':
+        write(os.path.join(root, 'src', name), 'Identical content.\n')
+        publisher.publish(os.path.join(root, 'src', name), os.path.join(root, 'out', name))
+    return publisher
+
+
+def test_identical_files_are_linked_together_only_with_hardlinks(tmp_path: Any) -> None:
+    for strategy in PUBLISH_AUTO, PUBLISH_COPY, PUBLISH_HARDLINK:
+        root = tmp_path / strategy
+        publisher = publish_twins(root, strategy)
+        linked = strategy == PUBLISH_HARDLINK
+        assert (DEDUPLICATED in publisher.stats) == linked
+        assert os.path.samefile(str(root / 'out' / 'a'), str(root / 'out' / 'b')) == linked
+
+
+def test_only_unsupported_methods_are_skipped_for_the_device(tmp_path: Any, monkeypatch: Any) -> None:
+    def fail(_source: str, _target: str) -> None:
+        raise OSError(error, os.strerror(error))
+
+    monkeypatch.setitem(publish.METHODS, publish.PUBLISH_HARDLINK, fail)
+    for error, unsupported in (errno.EPERM, False), (errno.EXDEV, True):
+        root = tmp_path / errno.errorcode[error]
+        publisher = publish_twins(root, PUBLISH_HARDLINK)
+        assert ((PUBLISH_HARDLINK, os.stat(str(root)).st_dev) in publisher.unsupported) == unsupported
+        assert (root / 'out' / 'b').is_file()
@@ -0,0 +1,43 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import os
+from typing import Any
+
+import pytest
+
+from fxwebgen.watcher import InotifyWatcher
+
+from conftest import write
+
+
+@pytest.fixture
+def watcher(tmp_path: Any) -> Any:
+    root = os.path.join(str(tmp_path), 'pages')
+    write(os.path.join(root, 'docs', 'sub', 'page.md'), 'Page.\n')
+    try:
+        watcher = InotifyWatcher([root], delay=0.05)
+    except (OSError, AttributeError) as e:
+        pytest.skip(f'inotify is not available: {e}')
+    yield watcher
+    watcher.close()
+
+
+def test_watches_of_a_directory_moved_out_are_removed(watcher: InotifyWatcher) -> None:
+    root = watcher.roots[0]
+    moved = os.path.join(os.path.dirname(root), 'moved')
+    os.rename(os.path.join(root, 'docs'), moved)
+    assert os.path.join(root, 'docs') in watcher.wait()
+    assert sorted(watcher.watches.values()) == [root]
+    write(os.path.join(moved, 'sub', 'other.md'), 'Other.\n')
+    write(os.path.join(root, 'index.md'), 'Index.\n')
+    assert watcher.wait() == {os.path.join(root, 'index.md')}
+
+
+def test_watches_of_a_renamed_directory_are_remapped(watcher: InotifyWatcher) -> None:
+    root = watcher.roots[0]
+    os.rename(os.path.join(root, 'docs'), os.path.join(root, 'guide'))
+    watcher.wait()
+    assert sorted(watcher.watches.values()) == [root, os.path.join(root, 'guide'), os.path.join(root, 'guide', 'sub')]
+    write(os.path.join(root, 'guide', 'sub', 'other.md'), 'Other.\n')
+    assert watcher.wait() == {os.path.join(root, 'guide', 'sub', 'other.md')}